@@ -0,0 +1,121 @@
+import os, asyncio, logging
+from collections import deque
+from datetime import datetime
+from typing import List, Optional, Annotated
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import insert
+from .db import AsyncSessionLocal, ClientAction
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Client action ingestion configuration
+ACTION_BATCH_MAX_EVENTS = int(os.getenv("ACTION_BATCH_MAX_EVENTS", "100"))
+ACTION_BUFFER_SIZE = int(os.getenv("ACTION_BUFFER_SIZE", "10000"))
+ACTION_FLUSH_SIZE = int(os.getenv("ACTION_FLUSH_SIZE", "500"))
+ACTION_FLUSH_INTERVAL = float(os.getenv("ACTION_FLUSH_INTERVAL", "5"))
+
+# Longest value stored for each event field
+ACTION_FIELD_LIMITS = {"action": 64, "details": 1000, "page": 64, "timestamp": 40}
+
+class ClientActionEvent(BaseModel):
+    """
+    One client-side analytics event, as sent by logUserAction in the templates.
+
+    Oversized strings are cut to their maximum length rather than rejected: a 422
+    would drop the whole batch, and sendBeacon never retries.
+    """
+
+    action: str = Field(max_length=ACTION_FIELD_LIMITS["action"])
+    details: str = Field("none", max_length=ACTION_FIELD_LIMITS["details"])
+    page: str = Field("unknown", max_length=ACTION_FIELD_LIMITS["page"])
+    timestamp: Optional[str] = Field(None, max_length=ACTION_FIELD_LIMITS["timestamp"])
+
+    @field_validator(*ACTION_FIELD_LIMITS, mode="before")
+    @classmethod
+    def truncate(cls, value, info):
+        if isinstance(value, str):
+            return value[:ACTION_FIELD_LIMITS[info.field_name]]
+        return value
+
+# Request body of the batch endpoint: a bare JSON array of events
+ClientActionBatch = Annotated[List[ClientActionEvent], Field(max_length=ACTION_BATCH_MAX_EVENTS)]
+
+class ActionBuffer:
+    """
+    Bounded in-memory buffer of client actions, written to the database in bulk.
+
+    When the buffer is full the oldest events are dropped, so a storage outage costs
+    analytics rather than memory.
+    """
+
+    def __init__(self, max_size: int = ACTION_BUFFER_SIZE, flush_size: int = ACTION_FLUSH_SIZE):
+        self.flush_size = flush_size
+        self._events = deque(maxlen=max_size)
+        self._flush_requested = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flushes = 0
+
+    def add(self, events: List[ClientActionEvent]):
+        received_at = datetime.now()
+        for event in events:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append({
+                "action": event.action,
+                "page": event.page,
+                "details": event.details,
+                "client_timestamp": event.timestamp,
+                "received_at": received_at
+            })
+        self.received += len(events)
+        if len(self._events) >= self.flush_size:
+            self._flush_requested.set()
+
+    async def flush(self):
+        """Write everything buffered so far with one multi-row INSERT."""
+        if not self._events:
+            return 0
+        rows = list(self._events)
+        self._events.clear()
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(insert(ClientAction), rows)
+                await session.commit()
+        except Exception as e:
+            logger.error("Failed to store %d client actions: %s", len(rows), e)
+            self.dropped += len(rows)
+            return 0
+        self.flushed += len(rows)
+        self.flushes += 1
+        return len(rows)
+
+    async def run(self, interval: float = ACTION_FLUSH_INTERVAL):
+        """Flush every `interval` seconds, or sooner once `flush_size` events are waiting."""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_requested.clear()
+                await self.flush()
+        finally:
+            # Do not lose what is buffered when the app shuts down
+            await asyncio.shield(self.flush())
+
+    def stats(self):
+        return {
+            "buffered": len(self._events),
+            "received": self.received,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "dropped": self.dropped
+        }
+
+action_buffer = ActionBuffer()
+
+def start_action_flusher() -> asyncio.Task:
+    return asyncio.create_task(action_buffer.run())
@@ -0,0 +1,162 @@
+import os, json, base64, logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, case, and_, or_, distinct
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import User, Stock, PasswordReset
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Admin dashboard configuration
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
+ADMIN_TOP_SYMBOLS = int(os.getenv("ADMIN_TOP_SYMBOLS", "10"))
+
+# Reset links expire after this long (the reset email promises 24 hours)
+PASSWORD_RESET_LIFETIME = timedelta(hours=24)
+
+RESET_STATUSES = ("all", "active", "expired")
+
+def encode_cursor(*values) -> str:
+    """Opaque, URL-safe keyset cursor from the sort key of the last row on a page."""
+    return base64.urlsafe_b64encode(json.dumps([str(value) for value in values]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, length: int):
+    """
+    Returns:
+        The cursor's values as strings, or None for a missing or malformed cursor
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        logger.warning("Ignoring malformed admin cursor %r", cursor)
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+def _page(rows, limit: int, cursor_of):
+    """Trim the extra lookahead row and derive the next cursor from the last row kept."""
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    return {"rows": rows, "next_cursor": cursor_of(rows[-1]) if has_next and rows else None}
+
+def _contains(column, q: str):
+    # Escape LIKE wildcards so a search for "a_b" does not match "axb"
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+async def get_dashboard_summary(session: AsyncSession):
+    """Counts and top tracked symbols, computed with aggregate queries rather than by loading rows."""
+    users = (await session.execute(
+        select(
+            func.count(User.id),
+            func.coalesce(func.sum(case((User.is_active, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((User.is_verified, 1), else_=0)), 0)
+        )
+    )).one()
+
+    stocks = (await session.execute(
+        select(func.count(Stock.id), func.count(distinct(Stock.symbol)))
+    )).one()
+
+    tracked = func.count(Stock.id).label("tracked")
+    top_symbols = (await session.execute(
+        select(Stock.symbol, tracked)
+        .group_by(Stock.symbol)
+        .order_by(tracked.desc(), Stock.symbol)
+        .limit(ADMIN_TOP_SYMBOLS)
+    )).all()
+
+    cutoff = datetime.now() - PASSWORD_RESET_LIFETIME
+    resets = (await session.execute(
+        select(
+            func.count(PasswordReset.id),
+            func.coalesce(func.sum(case((PasswordReset.created_at > cutoff, 1), else_=0)), 0)
+        )
+    )).one()
+
+    return {
+        "users": users[0],
+        "active_users": users[1],
+        "verified_users": users[2],
+        "tracked_stocks": stocks[0],
+        "distinct_symbols": stocks[1],
+        "top_symbols": [{"symbol": symbol, "count": count} for symbol, count in top_symbols],
+        "password_resets": resets[0],
+        "active_password_resets": resets[1]
+    }
+
+async def list_users(session: AsyncSession, q: str = "", cursor: str = "", limit: int = ADMIN_PAGE_SIZE):
+    """One page of users ordered by email, with each user's tracked stock count."""
+    stock_count = (
+        select(func.count(Stock.id)).where(Stock.user_id == User.id).correlate(User).scalar_subquery()
+    )
+    query = select(User.id, User.email, User.is_active, User.is_verified, stock_count.label("stock_count"))
+    if q:
+        query = query.where(_contains(User.email, q))
+    after = decode_cursor(cursor, 1)
+    if after:
+        query = query.where(User.email > after[0])
+    rows = (await session.execute(query.order_by(User.email).limit(limit + 1))).all()
+
+    users = [
+        {"id": str(row.id), "email": row.email, "is_active": row.is_active, "is_verified": row.is_verified, "stock_count": row.stock_count}
+        for row in rows
+    ]
+    return _page(users, limit, lambda user: encode_cursor(user["email"]))
+
+async def list_stocks(session: AsyncSession, q: str = "", cursor: str = "", limit: int = ADMIN_PAGE_SIZE):
+    """One page of tracked stocks ordered by symbol, then user email. `q` matches a symbol prefix or part of an email."""
+    query = select(Stock.id, Stock.symbol, User.email).join(User, Stock.user_id == User.id)
+    if q:
+        query = query.where(or_(Stock.symbol.startswith(q.strip().upper(), autoescape=True), _contains(User.email, q)))
+    after = decode_cursor(cursor, 2)
+    if after:
+        symbol, email = after
+        query = query.where(or_(Stock.symbol > symbol, and_(Stock.symbol == symbol, User.email > email)))
+    rows = (await session.execute(query.order_by(Stock.symbol, User.email).limit(limit + 1))).all()
+
+    stocks = [{"id": str(row.id), "symbol": row.symbol, "user_email": row.email} for row in rows]
+    return _page(stocks, limit, lambda stock: encode_cursor(stock["symbol"], stock["user_email"]))
+
+async def list_password_resets(session: AsyncSession, q: str = "", status: str = "all", cursor: str = "", limit: int = ADMIN_PAGE_SIZE):
+    """One page of password resets, newest first, optionally only active or only expired ones."""
+    query = select(PasswordReset.id, PasswordReset.token, PasswordReset.created_at, User.email).join(
+        User, PasswordReset.user_id == User.id
+    )
+    cutoff = datetime.now() - PASSWORD_RESET_LIFETIME
+    if status == "active":
+        query = query.where(PasswordReset.created_at > cutoff)
+    elif status == "expired":
+        query = query.where(PasswordReset.created_at <= cutoff)
+    if q:
+        query = query.where(_contains(User.email, q))
+    after = decode_cursor(cursor, 2)
+    if after:
+        try:
+            created_at = datetime.fromisoformat(after[0])
+        except ValueError:
+            created_at = None
+        if created_at is not None:
+            query = query.where(or_(
+                PasswordReset.created_at < created_at,
+                and_(PasswordReset.created_at == created_at, PasswordReset.token < after[1])
+            ))
+    rows = (await session.execute(
+        query.order_by(PasswordReset.created_at.desc(), PasswordReset.token.desc()).limit(limit + 1)
+    )).all()
+
+    resets = []
+    for row in rows:
+        expires_at = row.created_at + PASSWORD_RESET_LIFETIME
+        resets.append({
+            "id": str(row.id),
+            "user_email": row.email,
+            "token": row.token,
+            "created_at": row.created_at,
+            "expires_at": expires_at,
+            "is_expired": expires_at <= datetime.now()
+        })
+    return _page(resets, limit, lambda reset: encode_cursor(reset["created_at"].isoformat(), reset["token"]))
@@ -1,13 +1,59 @@
 import os, uuid
+from dataclasses import dataclass
+import jwt
 from fastapi import Depends, Request
-from fastapi_users import FastAPIUsers, BaseUserManager, UUIDIDMixin
+from fastapi_users import FastAPIUsers, BaseUserManager, UUIDIDMixin, exceptions
 from fastapi_users.db import SQLAlchemyUserDatabase
 from fastapi_users.authentication import AuthenticationBackend, CookieTransport, JWTStrategy
+from fastapi_users.jwt import decode_jwt, generate_jwt
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
 from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import TTLCache
 from .db import User, get_async_session
 
 SECRET = os.getenv("SECRET_KEY", "CHANGEME")
 
+# Authenticated user cache configuration
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+AUTH_USER_CACHE_MAX_SIZE = int(os.getenv("AUTH_USER_CACHE_MAX_SIZE", "10000"))
+# Put email, is_active and is_verified in the JWT so read-only pages can skip the user lookup.
+# Those values are then only refreshed when the user logs in again.
+AUTH_TOKEN_CLAIMS = os.getenv("AUTH_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+_USER_COLUMNS = tuple(attr.key for attr in inspect(User).column_attrs)
+
+class UserCache(TTLCache):
+    """Cache of user rows for token resolution, keyed by user id."""
+
+    def get(self, user_id):
+        """Return a new detached User built from the cached row, so requests never share an instance."""
+        columns = super().get(user_id)
+        if columns is None:
+            return None
+        user = User(**columns)
+        # Persistent identity without a session: adding it to a session updates rather than inserts
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, user):
+        super().set(user.id, {key: getattr(user, key) for key in _USER_COLUMNS})
+
+user_cache = UserCache(AUTH_USER_CACHE_TTL, AUTH_USER_CACHE_MAX_SIZE)
+
+def invalidate_cached_user(user_id):
+    """Drop a user's cached row after it changes."""
+    user_cache.invalidate(user_id)
+
+@dataclass(frozen=True)
+class TokenUser:
+    """The user as described by the JWT's claims; read-only, never loaded from the database."""
+
+    id: uuid.UUID
+    email: str
+    is_active: bool
+    is_verified: bool
+
 # Get user DB adapter
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
     yield SQLAlchemyUserDatabase(session, User)
@@ -20,19 +66,73 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     async def on_after_register(self, user: User, request: Request = None):
         print(f"User {user.email} registered.")
 
+    async def on_after_update(self, user: User, update_dict: dict, request: Request = None):
+        invalidate_cached_user(user.id)
+
+    async def on_after_reset_password(self, user: User, request: Request = None):
+        invalidate_cached_user(user.id)
+
+    async def on_after_delete(self, user: User, request: Request = None):
+        invalidate_cached_user(user.id)
+
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
 
 # Authentication setup
 cookie_transport = CookieTransport(
-    cookie_name="auth", 
+    cookie_name="auth",
     cookie_max_age=3600,
     cookie_secure=False,  # Set to True in production with HTTPS
     cookie_httponly=True
 )
 
+class CachedJWTStrategy(JWTStrategy):
+    """JWT strategy that resolves the token's user through the user cache."""
+
+    def _decode(self, token):
+        try:
+            return decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return None
+
+    async def read_token(self, token, user_manager):
+        if token is None:
+            return None
+        data = self._decode(token)
+        if data is None or data.get("sub") is None:
+            return None
+
+        try:
+            user_id = user_manager.parse_id(data["sub"])
+        except exceptions.InvalidID:
+            return None
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await user_manager.get(user_id)
+            except exceptions.UserNotExists:
+                return None
+            user_cache.set(user)
+        return user
+
+    def read_claims(self, token):
+        """Return a TokenUser from the token's claims, or None if the token is invalid or has no claims."""
+        data = self._decode(token) if token else None
+        if data is None or "email" not in data:
+            return None
+        try:
+            return TokenUser(uuid.UUID(data["sub"]), data["email"], data["is_active"], data["is_verified"])
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    async def write_token(self, user):
+        data = {"sub": str(user.id), "aud": self.token_audience}
+        if AUTH_TOKEN_CLAIMS:
+            data.update(email=user.email, is_active=user.is_active, is_verified=user.is_verified)
+        return generate_jwt(data, self.encode_key, self.lifetime_seconds, algorithm=self.algorithm)
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET, lifetime_seconds=3600)
+    return CachedJWTStrategy(secret=SECRET, lifetime_seconds=3600)
 
 auth_backend = AuthenticationBackend(
     name="cookie",
@@ -44,4 +144,17 @@ auth_backend = AuthenticationBackend(
 fastapi_users = FastAPIUsers[User, uuid.UUID](get_user_manager, [auth_backend])
 
 # Current active user dependency
-current_active_user = fastapi_users.current_user(active=True) 
\ No newline at end of file
+current_active_user = fastapi_users.current_user(active=True)
+
+async def optional_page_user(request: Request, user_manager=Depends(get_user_manager)):
+    """
+    Optional current user for read-only pages. With AUTH_TOKEN_CLAIMS this is a
+    TokenUser read from the JWT alone; otherwise the (cached) User row.
+    """
+    token = request.cookies.get(cookie_transport.cookie_name)
+    strategy = get_jwt_strategy()
+    if token and AUTH_TOKEN_CLAIMS:
+        user = strategy.read_claims(token)
+        if user is not None:
+            return user
+    return await strategy.read_token(token, user_manager)
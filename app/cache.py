@@ -0,0 +1,38 @@
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries expire `ttl` seconds after they are set
+    (never, with ttl None). Invalidation is per process, so when other workers write
+    the same data the TTL bounds how long a stale entry can be served.
+    """
+
+    def __init__(self, ttl: float = None, max_size: int = 1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or an expired entry."""
+        entry = self._entries.get(key)
+        if entry is None or (self.ttl is not None and time.monotonic() - entry[1] > self.ttl):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def stats(self):
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
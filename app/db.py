@@ -2,7 +2,8 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os, uuid, logging
 from fastapi_users.db import SQLAlchemyBaseUserTableUUID
-from sqlalchemy import Column, String, ForeignKey, DateTime
+from fastapi_users_db_sqlalchemy.generics import GUID
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, DateTime, Date, Float, BigInteger, Boolean, Index, delete, exists, inspect, select, update
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 
@@ -32,6 +33,68 @@ async def create_db_and_tables():
         logger.error(f"Database tables error: {str(e)}")
         raise
 
+    async with engine.begin() as conn:
+        await conn.run_sync(_apply_migrations)
+
+    # create_all skips tables that already exist, so add indexes introduced later explicitly.
+    # Watchlist writes rely on ON CONFLICT (user_id, symbol), so a missing index is fatal.
+    for index in [*Stock.__table__.indexes, *PasswordReset.__table__.indexes]:
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(_create_index, index)
+        except Exception as e:
+            logger.error("Database index error (%s): %s", index.name, e)
+            raise
+
+def _hyphenate_sqlite_user_ids(sync_conn):
+    # stocks.user_id and password_resets.user_id were declared as the postgres UUID type, which
+    # SQLite stores as 32-digit hex, while users.id (fastapi-users' GUID) is stored hyphenated.
+    # Joins against users matched nothing, so rewrite old rows in the users.id format.
+    if sync_conn.dialect.name != "sqlite":
+        return
+    for table in ("stocks", "password_resets"):
+        sync_conn.exec_driver_sql(
+            f"UPDATE {table} SET user_id = lower(substr(user_id, 1, 8) || '-' || substr(user_id, 9, 4) || '-' || "
+            f"substr(user_id, 13, 4) || '-' || substr(user_id, 17, 4) || '-' || substr(user_id, 21)) "
+            f"WHERE length(user_id) = 32"
+        )
+
+def _recheck_complete_price_history(sync_conn):
+    # A "5d" chart view used to mark a symbol's stored history as complete, after which
+    # longer periods were served from those few bars. Let the next long view re-download.
+    ranges = PriceHistoryRange.__table__
+    sync_conn.execute(update(ranges).where(ranges.c.is_complete.is_(True)).values(is_complete=False))
+
+# One-time data migrations, applied in order and recorded in schema_migrations
+MIGRATIONS = [
+    ("0001_hyphenate_sqlite_user_ids", _hyphenate_sqlite_user_ids),
+    ("0002_recheck_complete_price_history", _recheck_complete_price_history),
+]
+
+def _apply_migrations(sync_conn):
+    migrations = SchemaMigration.__table__
+    applied = set(sync_conn.execute(select(migrations.c.name)).scalars())
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+        migrate(sync_conn)
+        sync_conn.execute(migrations.insert().values(name=name, applied_at=datetime.now()))
+        logger.info("Applied database migration %s", name)
+
+def _create_index(sync_conn, index):
+    if index.name in {existing["name"] for existing in inspect(sync_conn).get_indexes(index.table.name)}:
+        return
+    if index.table is Stock.__table__ and index.unique:
+        # Older databases could hold the same symbol twice for a user; keep one row of each
+        stocks = Stock.__table__
+        other = stocks.alias("other")
+        result = sync_conn.execute(delete(stocks).where(exists().where(
+            other.c.user_id == stocks.c.user_id, other.c.symbol == stocks.c.symbol, other.c.id < stocks.c.id
+        )))
+        if result.rowcount:
+            logger.warning("Removed %d duplicate watchlist rows before creating %s", result.rowcount, index.name)
+    index.create(sync_conn)
+
 async def get_async_session():
     try:
         async with AsyncSessionLocal() as session:
@@ -47,12 +110,54 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
 class Stock(Base):
     __tablename__ = "stocks"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    user_id = Column(GUID, ForeignKey("users.id", ondelete="CASCADE"))
     symbol = Column(String, nullable=False)
+    __table_args__ = (
+        Index("ix_stocks_user_id_symbol", "user_id", "symbol", unique=True),
+        # Admin dashboard: top symbols (GROUP BY) and symbol-ordered pages
+        Index("ix_stocks_symbol", "symbol"),
+    )
 
 class PasswordReset(Base):
     __tablename__ = "password_resets"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    user_id = Column(GUID, ForeignKey("users.id", ondelete="CASCADE"))
     token = Column(String, nullable=False, unique=True)
-    created_at = Column(DateTime, default=datetime.now) 
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.now, index=True)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.now)
+
+class AdminSession(Base):
+    __tablename__ = "admin_sessions"
+    token_hash = Column(String(64), primary_key=True)  # sha256 of the session cookie
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class PriceBar(Base):
+    __tablename__ = "price_bars"
+    symbol = Column(String, primary_key=True)
+    date = Column(Date, primary_key=True)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(BigInteger)
+
+class PriceHistoryRange(Base):
+    __tablename__ = "price_history_ranges"
+    symbol = Column(String, primary_key=True)
+    first_date = Column(Date, nullable=False)
+    last_date = Column(Date, nullable=False)
+    is_complete = Column(Boolean, default=False)  # True once the full ("max") history is stored
+    updated_at = Column(DateTime, default=datetime.now)
+
+class ClientAction(Base):
+    __tablename__ = "client_actions"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    action = Column(String, nullable=False)
+    page = Column(String)
+    details = Column(Text)
+    client_timestamp = Column(String)  # as reported by the browser, not trusted for ordering
+    received_at = Column(DateTime, default=datetime.now, index=True)
@@ -0,0 +1,91 @@
+import asyncio, os, time, logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Upstream I/O pool configuration
+UPSTREAM_MAX_WORKERS = int(os.getenv("UPSTREAM_MAX_WORKERS", "16"))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", str(UPSTREAM_MAX_WORKERS)))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "20"))
+
+# Thread pool for blocking yfinance and SMTP calls, kept separate from the default executor
+_executor = ThreadPoolExecutor(max_workers=UPSTREAM_MAX_WORKERS, thread_name_prefix="upstream")
+_semaphore = None
+
+executor_stats = {
+    "max_workers": UPSTREAM_MAX_WORKERS,
+    "max_concurrency": UPSTREAM_MAX_CONCURRENCY,
+    "active": 0,
+    "waiting": 0,
+    "completed": 0,
+    "timeouts": 0,
+    "errors": 0,
+    "queue_wait_total": 0.0,
+    "queue_wait_max": 0.0
+}
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(UPSTREAM_MAX_CONCURRENCY)
+    return _semaphore
+
+async def run_blocking(func, *args, timeout: float = UPSTREAM_TIMEOUT, **kwargs):
+    """
+    Run a blocking call on the upstream thread pool without stalling the event loop.
+
+    At most UPSTREAM_MAX_CONCURRENCY calls run at once; extra callers wait their turn
+    and that wait is recorded as queue-wait time. The caller gets asyncio.TimeoutError
+    after `timeout` seconds, but the slot is only released once the thread finishes,
+    so abandoned calls still count against the limit.
+    """
+    semaphore = _get_semaphore()
+    queued_at = time.monotonic()
+    executor_stats["waiting"] += 1
+    try:
+        await semaphore.acquire()
+    finally:
+        executor_stats["waiting"] -= 1
+
+    queue_wait = time.monotonic() - queued_at
+    executor_stats["queue_wait_total"] += queue_wait
+    executor_stats["queue_wait_max"] = max(executor_stats["queue_wait_max"], queue_wait)
+    executor_stats["active"] += 1
+
+    loop = asyncio.get_running_loop()
+    try:
+        future = loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+    except Exception:
+        executor_stats["active"] -= 1
+        semaphore.release()
+        raise
+
+    def _release(_):
+        executor_stats["active"] -= 1
+        executor_stats["completed"] += 1
+        semaphore.release()
+    future.add_done_callback(_release)
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+    except asyncio.TimeoutError:
+        executor_stats["timeouts"] += 1
+        logger.warning("Upstream call %s timed out after %ss", getattr(func, "__name__", func), timeout)
+        raise
+    except Exception:
+        executor_stats["errors"] += 1
+        raise
+
+def get_executor_stats():
+    """Pool saturation and queue-wait metrics."""
+    started = executor_stats["completed"] + executor_stats["active"]
+    return {
+        **executor_stats,
+        "saturation": executor_stats["active"] / UPSTREAM_MAX_CONCURRENCY,
+        "queue_wait_avg": executor_stats["queue_wait_total"] / started if started else 0.0
+    }
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,21 @@
+import os
+from .cache import TTLCache
+
+# Fragment cache configuration
+FRAGMENT_CACHE_MAX_SIZE = int(os.getenv("FRAGMENT_CACHE_MAX_SIZE", "256"))
+
+class FragmentCache(TTLCache):
+    """
+    LRU cache of rendered HTML fragments. Keys must capture everything the fragment
+    depends on (e.g. the quote snapshot version), so entries never need invalidating;
+    superseded ones simply age out.
+    """
+
+    def get_or_render(self, key, render):
+        html = self.get(key)
+        if html is None:
+            html = render()
+            self.set(key, html)
+        return html
+
+fragment_cache = FragmentCache(max_size=FRAGMENT_CACHE_MAX_SIZE)
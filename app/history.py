@@ -0,0 +1,179 @@
+import os, asyncio, logging, weakref
+from datetime import date, datetime, timedelta
+import pandas as pd
+from sqlalchemy import select, delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import PriceBar, PriceHistoryRange
+from .providers import PERIOD_LOOKBACK, market_data
+from .singleflight import run_upstream
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Seconds before the latest stored bar is re-fetched (today's bar changes intraday)
+HISTORY_TAIL_TTL = float(os.getenv("HISTORY_TAIL_TTL", "300"))
+
+HISTORY_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# One lock per symbol while its bars are downloaded and stored, so concurrent first
+# views of a chart make a single download and a single coverage insert
+_store_locks = weakref.WeakValueDictionary()
+
+def _store_lock(symbol: str) -> asyncio.Lock:
+    lock = _store_locks.get(symbol)
+    if lock is None:
+        lock = _store_locks[symbol] = asyncio.Lock()
+    return lock
+
+def _period_start(period: str, today: date):
+    lookback = PERIOD_LOOKBACK[period]
+    if lookback is None:
+        return None
+    return (pd.Timestamp(today) - lookback).date()
+
+async def _store_bars(session: AsyncSession, symbol: str, hist, coverage, is_complete: bool = False):
+    """Replace stored bars in the downloaded date range and widen the coverage record."""
+    hist = hist.dropna(subset=["Close"])
+    if hist.empty:
+        if coverage is not None:
+            coverage.updated_at = datetime.now()
+            await session.commit()
+        return coverage
+
+    rows = [
+        {
+            "symbol": symbol,
+            "date": timestamp.date(),
+            "open": float(bar["Open"]),
+            "high": float(bar["High"]),
+            "low": float(bar["Low"]),
+            "close": float(bar["Close"]),
+            "volume": int(bar["Volume"])
+        } for timestamp, bar in hist[HISTORY_COLUMNS].iterrows()
+    ]
+    first_date, last_date = rows[0]["date"], rows[-1]["date"]
+
+    await session.execute(
+        delete(PriceBar).where(
+            PriceBar.symbol == symbol,
+            PriceBar.date >= first_date,
+            PriceBar.date <= last_date
+        )
+    )
+    await session.execute(insert(PriceBar), rows)
+
+    if coverage is None:
+        coverage = PriceHistoryRange(symbol=symbol, first_date=first_date, last_date=last_date)
+        session.add(coverage)
+    else:
+        coverage.first_date = min(coverage.first_date, first_date)
+        coverage.last_date = max(coverage.last_date, last_date)
+    coverage.is_complete = bool(coverage.is_complete or is_complete)
+    coverage.updated_at = datetime.now()
+    await session.commit()
+    return coverage
+
+async def _load_bars(session: AsyncSession, symbol: str, start):
+    query = select(PriceBar).where(PriceBar.symbol == symbol)
+    if start is not None:
+        query = query.where(PriceBar.date >= start)
+    result = await session.execute(query.order_by(PriceBar.date))
+    bars = result.scalars().all()
+
+    hist = pd.DataFrame(
+        [(bar.open, bar.high, bar.low, bar.close, bar.volume) for bar in bars],
+        columns=HISTORY_COLUMNS,
+        index=pd.DatetimeIndex([bar.date for bar in bars], name="Date")
+    )
+    return hist
+
+def _needs_download(coverage, start):
+    """Nothing stored yet, or the period reaches further back than what we have."""
+    return coverage is None or (start is None and not coverage.is_complete) or (
+        start is not None and start < coverage.first_date and not coverage.is_complete
+    )
+
+def _tail_expired(coverage):
+    return datetime.now() - coverage.updated_at > timedelta(seconds=HISTORY_TAIL_TTL)
+
+async def _get_coverage(session: AsyncSession, symbol: str):
+    # populate_existing: pick up another request's update instead of the session's copy
+    return (await session.execute(
+        select(PriceHistoryRange).where(PriceHistoryRange.symbol == symbol).execution_options(populate_existing=True)
+    )).scalars().first()
+
+async def get_history_version(session: AsyncSession, symbol: str, period: str = "1y"):
+    """
+    Cheap version key for the bars get_price_history would return right now, read
+    from the coverage record alone. The period's start date is part of it, since a
+    rolling window (e.g. "1y") shows different bars from one day to the next.
+
+    Returns:
+        Tuple of (symbol, period, period start date, last stored bar date, last update
+        time), or None when serving the period would first need a download
+    """
+    symbol = symbol.upper()
+    coverage = await _get_coverage(session, symbol)
+    start = _period_start(period, date.today())
+    if _needs_download(coverage, start) or _tail_expired(coverage):
+        return None
+    return (symbol, period, start.isoformat() if start else None, coverage.last_date.isoformat(), coverage.updated_at.isoformat())
+
+async def _update_bars(session: AsyncSession, symbol: str, period: str, start, coverage):
+    """Download whatever the period is missing and store it; returns the coverage record, or None if there is nothing stored."""
+    try:
+        if _needs_download(coverage, start):
+            hist = await run_upstream(("history", symbol, period), market_data.get_history, symbol, period=period)
+            if hist.empty and coverage is None:
+                return None
+            # A first bar well after the requested start means the listing is younger than the
+            # period. "5d" is the last five bars rather than a calendar window, so it proves nothing.
+            is_complete = period == "max" or (
+                period != "5d" and not hist.empty and hist.index[0].date() > start + timedelta(days=7)
+            )
+            coverage = await _store_bars(session, symbol, hist, coverage, is_complete=is_complete)
+        elif _tail_expired(coverage):
+            # Re-fetch from the last stored bar so a partial intraday bar gets replaced
+            start_date = coverage.last_date.isoformat()
+            hist = await run_upstream(("history", symbol, start_date), market_data.get_history, symbol, start=start_date)
+            coverage = await _store_bars(session, symbol, hist, coverage)
+    except IntegrityError:
+        # Another worker process stored the same bars first; serve what it stored
+        await session.rollback()
+        logger.info("Price history for %s was stored concurrently, reloading", symbol)
+        coverage = await _get_coverage(session, symbol)
+    except Exception as e:
+        await session.rollback()
+        logger.error("Price history update failed for %s: %s", symbol, e)
+        if coverage is None:
+            raise
+    return coverage
+
+async def get_price_history(session: AsyncSession, symbol: str, period: str = "1y"):
+    """
+    Return daily OHLCV bars for a chart period, served from the local price store.
+
+    Only the missing parts are downloaded: the whole period the first time a symbol
+    (or an older start date) is requested, and afterwards just the tail since the
+    last stored bar once HISTORY_TAIL_TTL has passed.
+
+    Returns:
+        DataFrame indexed by date with Open, High, Low, Close and Volume columns
+        (empty when the provider has no data for the symbol)
+    """
+    symbol = symbol.upper()
+    today = date.today()
+    start = _period_start(period, today)
+
+    coverage = await _get_coverage(session, symbol)
+    if _needs_download(coverage, start) or _tail_expired(coverage):
+        async with _store_lock(symbol):
+            # Another request may have stored the bars while this one waited
+            coverage = await _get_coverage(session, symbol)
+            coverage = await _update_bars(session, symbol, period, start, coverage)
+
+    hist = await _load_bars(session, symbol, start)
+    if period == "5d":
+        hist = hist.tail(5)
+    return hist
@@ -0,0 +1,41 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request
+from fastapi.responses import Response
+
+def make_etag(*parts) -> str:
+    """Weak ETag derived from everything a response depends on (weak, since bodies may be compressed)."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def http_date(value: datetime) -> str:
+    """Format a datetime (naive values are taken as local time) as an HTTP date."""
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime = None) -> bool:
+    """
+    Evaluate If-None-Match (weak comparison) and, only when it is absent,
+    If-Modified-Since, as RFC 9110 specifies.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        wanted = etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError, IndexError):
+            return False
+        if since.tzinfo is None:
+            # asctime dates and "-0000" offsets parse as naive; HTTP dates are always UTC
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.astimezone().replace(microsecond=0) <= since
+    return False
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,106 @@
+import os, logging
+from collections import OrderedDict
+import numpy as np
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Indicator configuration
+INDICATOR_SMA_WINDOWS = [int(w) for w in os.getenv("INDICATOR_SMA_WINDOWS", "20,50,200").split(",") if w.strip()]
+INDICATOR_EMA_WINDOWS = [int(w) for w in os.getenv("INDICATOR_EMA_WINDOWS", "12,26").split(",") if w.strip()]
+INDICATOR_RSI_PERIOD = int(os.getenv("INDICATOR_RSI_PERIOD", "14"))
+INDICATOR_CACHE_SIZE = int(os.getenv("INDICATOR_CACHE_SIZE", "256"))
+TRADING_DAYS_PER_YEAR = 252
+
+# (symbol, period, last bar timestamp) -> indicators
+_indicator_cache = OrderedDict()
+
+def _ewm_last(values, alpha: float):
+    """Last value of an exponentially weighted mean seeded with the first value (pandas adjust=False)."""
+    n = len(values)
+    weights = alpha * (1 - alpha) ** np.arange(n - 1, -1, -1, dtype=float)
+    weights[0] = (1 - alpha) ** (n - 1)
+    return float(np.dot(weights, values))
+
+def _compute(high, low, close, volume):
+    n = len(close)
+    current_price = float(close[-1])
+    prev_close = float(close[-2]) if n > 1 else current_price
+    change = current_price - prev_close
+
+    # Simple moving averages from a single cumulative sum
+    csum = np.concatenate(([0.0], np.cumsum(close)))
+    sma = {w: float((csum[-1] - csum[-1 - w]) / w) if n >= w else None for w in INDICATOR_SMA_WINDOWS}
+    ema = {w: _ewm_last(close, 2 / (w + 1)) if n >= w else None for w in INDICATOR_EMA_WINDOWS}
+
+    # RSI with Wilder smoothing of average gains and losses
+    rsi = None
+    if n > INDICATOR_RSI_PERIOD:
+        deltas = np.diff(close)
+        avg_gain = _ewm_last(np.clip(deltas, 0, None), 1 / INDICATOR_RSI_PERIOD)
+        avg_loss = _ewm_last(np.clip(-deltas, 0, None), 1 / INDICATOR_RSI_PERIOD)
+        rsi = 100.0 if avg_loss == 0 else float(100 - 100 / (1 + avg_gain / avg_loss))
+
+    # Annualized volatility of daily log returns
+    volatility = None
+    if n > 2:
+        returns = np.diff(np.log(close))
+        volatility = float(np.std(returns, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR))
+
+    drawdowns = close / np.maximum.accumulate(close) - 1
+    total_volume = volume.sum()
+    typical_price = (high + low + close) / 3
+
+    return {
+        "current_price": current_price,
+        "prev_close": prev_close,
+        "change": change,
+        "percent_change": (change / prev_close) * 100 if prev_close != 0 else 0,
+        "period_high": float(high.max()),
+        "period_low": float(low.min()),
+        "latest_volume": float(volume[-1]),
+        "avg_volume": float(volume.mean()),
+        "sma": sma,
+        "ema": ema,
+        "rsi": rsi,
+        "volatility": volatility,
+        "drawdown": float(drawdowns[-1]),
+        "max_drawdown": float(drawdowns.min()),
+        "vwap": float(np.dot(typical_price, volume) / total_volume) if total_volume else None
+    }
+
+def compute_indicators(symbol: str, period: str, hist):
+    """
+    Compute price statistics and technical indicators for a history frame.
+
+    Everything is derived in one vectorized pass over the OHLCV arrays and memoized
+    per (symbol, period, last bar timestamp), so repeat views of an unchanged series
+    cost a dict lookup.
+
+    Args:
+        symbol: Stock symbol, used for the memo key
+        period: Chart period, used for the memo key
+        hist: Non-empty DataFrame with High, Low, Close and Volume columns
+
+    Returns:
+        Dict of statistics; "sma" and "ema" map window size to value (None when the
+        series is shorter than the window)
+    """
+    # The last close is part of the key because today's bar is rewritten intraday
+    key = (symbol.upper(), period, hist.index[-1], len(hist), float(hist["Close"].iat[-1]))
+    cached = _indicator_cache.get(key)
+    if cached is not None:
+        _indicator_cache.move_to_end(key)
+        return cached
+
+    indicators = _compute(
+        hist["High"].to_numpy(dtype=float),
+        hist["Low"].to_numpy(dtype=float),
+        hist["Close"].to_numpy(dtype=float),
+        hist["Volume"].to_numpy(dtype=float)
+    )
+
+    _indicator_cache[key] = indicators
+    while len(_indicator_cache) > INDICATOR_CACHE_SIZE:
+        _indicator_cache.popitem(last=False)
+    return indicators
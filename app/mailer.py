@@ -0,0 +1,298 @@
+import os, sys, time, smtplib, asyncio, logging, threading
+from .executor import run_blocking
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Email configuration
+EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
+EMAIL_USER = os.getenv("EMAIL_USER", "")
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
+EMAIL_FROM = os.getenv("EMAIL_FROM", "noreply@stockmarket.com")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() in ("1", "true", "yes")
+# "smtp" sends, "console" only logs; by default we send only when credentials are set
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "smtp" if EMAIL_USER and EMAIL_PASSWORD else "console")
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", "1000"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "5"))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "2"))
+EMAIL_IDLE_TIMEOUT = float(os.getenv("EMAIL_IDLE_TIMEOUT", "60"))
+EMAIL_SMTP_TIMEOUT = float(os.getenv("EMAIL_SMTP_TIMEOUT", "20"))
+
+class OutgoingEmail:
+    __slots__ = ("to_email", "message", "attempts")
+
+    def __init__(self, to_email: str, message: str):
+        self.to_email = to_email
+        self.message = message
+        self.attempts = 0
+
+class MailQueue:
+    """
+    Outbound mail queue drained by one background worker.
+
+    The worker keeps a single authenticated SMTP connection open between sends
+    (closing it after EMAIL_IDLE_TIMEOUT of inactivity), sends whatever has queued
+    up in batches of up to EMAIL_BATCH_SIZE over that connection, and retries
+    temporary failures with exponential backoff. Callers only enqueue.
+
+    A batch checks the connection out for as long as it sends, so two batches never
+    share one. When a batch overruns its timeout the worker moves on with a fresh
+    connection; the late batch stops before its next message, drops its connection
+    and is settled (sent, failed or retried) only once its thread has finished, so
+    nothing it did send is sent again.
+    """
+
+    def __init__(self, backend: str = EMAIL_BACKEND):
+        self.backend = backend
+        self._queue = None
+        self._worker = None
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+        self._sending = {}  # batch send task -> its "abandoned" event
+        self._retry_handles = set()
+        self._stats = {
+            "queued": 0, "sent": 0, "failed": 0, "retried": 0, "dropped": 0,
+            "connections": 0, "batches": 0, "timeouts": 0
+        }
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=EMAIL_QUEUE_SIZE)
+        return self._queue
+
+    def enqueue(self, to_email: str, message: str) -> bool:
+        """Queue a fully formatted message; returns False if the queue is full."""
+        try:
+            self._get_queue().put_nowait(OutgoingEmail(to_email, message))
+        except asyncio.QueueFull:
+            self._stats["dropped"] += 1
+            logger.error("Mail queue full, dropping email to %s", to_email)
+            return False
+        self._stats["queued"] += 1
+        return True
+
+    # Blocking SMTP work, run on the upstream thread pool
+
+    def _connect(self):
+        smtp = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=EMAIL_SMTP_TIMEOUT)
+        if EMAIL_USE_TLS:
+            smtp.starttls()
+        if EMAIL_USER:
+            smtp.login(EMAIL_USER, EMAIL_PASSWORD)
+        self._stats["connections"] += 1
+        return smtp
+
+    @staticmethod
+    def _quit(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            pass
+
+    def _close(self):
+        """Close the idle connection, if any; a connection checked out by a batch is left alone."""
+        with self._smtp_lock:
+            smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            self._quit(smtp)
+
+    def _send_batch(self, batch, abandoned: threading.Event):
+        """
+        Send each message over the idle connection (or a new one) until the batch is
+        done or abandoned.
+
+        Returns:
+            List of (email, error or None) for the messages attempted
+        """
+        with self._smtp_lock:
+            smtp, self._smtp = self._smtp, None
+        results = []
+        for email in batch:
+            if abandoned.is_set():
+                break
+            try:
+                if smtp is None:
+                    smtp = self._connect()
+                try:
+                    smtp.sendmail(EMAIL_FROM, email.to_email, email.message)
+                except smtplib.SMTPServerDisconnected:
+                    # The server dropped an idle connection; reconnect once and resend
+                    smtp = self._connect()
+                    smtp.sendmail(EMAIL_FROM, email.to_email, email.message)
+                results.append((email, None))
+            except Exception as e:
+                if smtp is not None and not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+                    # The connection may be unusable; start fresh for the next message
+                    self._quit(smtp)
+                    smtp = None
+                results.append((email, e))
+
+        if smtp is not None:
+            # Hand the connection back for the next batch, unless this batch ran late
+            with self._smtp_lock:
+                if not abandoned.is_set() and self._smtp is None:
+                    self._smtp, smtp = smtp, None
+            if smtp is not None:
+                self._quit(smtp)
+        return results
+
+    # Worker
+
+    def _is_permanent(self, error: Exception) -> bool:
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return True
+        code = getattr(error, "smtp_code", None)
+        return code is not None and 500 <= code < 600
+
+    def _schedule_retry(self, email: OutgoingEmail):
+        delay = EMAIL_RETRY_BACKOFF * 2 ** (email.attempts - 1)
+        self._stats["retried"] += 1
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            try:
+                self._get_queue().put_nowait(email)
+            except asyncio.QueueFull:
+                self._stats["dropped"] += 1
+                logger.error("Mail queue full, dropping retry of email to %s", email.to_email)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+    def _record(self, email: OutgoingEmail, error: Exception = None):
+        email.attempts += 1
+        if error is None:
+            self._stats["sent"] += 1
+            logger.info("Email sent to %s", email.to_email)
+        elif self._is_permanent(error) or email.attempts >= EMAIL_MAX_RETRIES:
+            self._stats["failed"] += 1
+            logger.error("Failed to send email to %s after %d attempts: %s", email.to_email, email.attempts, error)
+        else:
+            logger.warning("Email to %s failed (attempt %d), retrying: %s", email.to_email, email.attempts, error)
+            self._schedule_retry(email)
+
+    def _settle(self, batch, sending: asyncio.Future):
+        """Record the outcome of a finished batch send; messages it never attempted are retried."""
+        self._sending.pop(sending, None)
+        self._stats["batches"] += 1
+        if sending.cancelled():
+            results, error = [], Exception("send cancelled")
+        elif sending.exception() is not None:
+            results, error = [], sending.exception()
+            logger.error("Email batch failed: %s", error)
+        else:
+            results, error = sending.result(), Exception("batch was abandoned before this message")
+        attempted = set()
+        for email, email_error in results:
+            attempted.add(id(email))
+            self._record(email, email_error)
+        for email in batch:
+            if id(email) not in attempted:
+                self._record(email, error)
+
+    async def _deliver(self, batch):
+        if self.backend != "smtp":
+            for email in batch:
+                logger.info("Email backend is %s, not sending email to %s", self.backend, email.to_email)
+                logger.info("Email content: %s", email.message)
+            return
+
+        abandoned = threading.Event()
+        # No run_blocking timeout: the batch is settled when its thread finishes, however late
+        sending = asyncio.ensure_future(run_blocking(self._send_batch, batch, abandoned, timeout=None))
+        self._sending[sending] = abandoned
+        sending.add_done_callback(lambda task: self._settle(batch, task))
+        await asyncio.wait({sending}, timeout=EMAIL_SMTP_TIMEOUT * (len(batch) + 1))
+        if not sending.done():
+            abandoned.set()
+            self._stats["timeouts"] += 1
+            logger.error("Email batch of %d timed out; continuing on a new connection", len(batch))
+
+    async def run(self):
+        queue = self._get_queue()
+        while True:
+            try:
+                first = await asyncio.wait_for(queue.get(), timeout=EMAIL_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if self._smtp is not None:
+                    await run_blocking(self._close)
+                continue
+
+            batch = [first]
+            while len(batch) < EMAIL_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            await self._deliver(batch)
+
+    def start(self) -> asyncio.Task:
+        self._worker = asyncio.create_task(self.run())
+        return self._worker
+
+    async def stop(self, timeout: float = 10):
+        """Give queued and in-flight mail up to `timeout` seconds to go out, then stop the worker."""
+        queue = self._get_queue()
+        deadline = time.monotonic() + timeout
+        while (not queue.empty() or self._sending) and time.monotonic() < deadline and self._worker and not self._worker.done():
+            await asyncio.sleep(0.1)
+        for handle in self._retry_handles:
+            handle.cancel()
+        # Anything still sending stops before its next message and drops its own connection
+        for abandoned in self._sending.values():
+            abandoned.set()
+        if self._worker:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        # QUIT can wait on the server, so keep it off the event loop
+        await run_blocking(self._close)
+
+    def stats(self):
+        return {**self._stats, "backend": self.backend, "pending": self._queue.qsize() if self._queue else 0}
+
+mail_queue = MailQueue()
+
+async def _serve_sink(host: str, port: int):
+    """
+    Minimal SMTP server that accepts and discards every message, as a local
+    stand-in for load-testing the mail queue without a real mail server.
+    """
+    received = 0
+
+    async def handle(reader, writer):
+        nonlocal received
+        writer.write(b"220 localhost SMTP sink\r\n")
+        in_data = False
+        while line := await reader.readline():
+            if in_data:
+                if line in (b".\r\n", b".\n"):
+                    in_data = False
+                    received += 1
+                    if received % 100 == 0:
+                        print(f"{received} messages received", flush=True)
+                    writer.write(b"250 OK\r\n")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                writer.write(b"250-localhost\r\n250 8BITMIME\r\n")
+            elif command == b"DATA":
+                in_data = True
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"SMTP sink listening on {host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    # Usage: python -m app.mailer sink [PORT]
+    args = sys.argv[1:]
+    if not args or args[0] != "sink":
+        sys.exit("Usage: python -m app.mailer sink [PORT]")
+    asyncio.run(_serve_sink("127.0.0.1", int(args[1]) if len(args) > 1 else 1025))
@@ -0,0 +1,204 @@
+import os, time, asyncio, logging
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Metrics configuration
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+# Latency buckets in seconds, from sub-millisecond cache reads up to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra: str = ""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values per label set, Prometheus style."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the `with` block, measured on the monotonic clock."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"'), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), series[-2]
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), series[-1]
+
+class CallbackMetric:
+    """Metric whose samples are read from a callback at scrape time, e.g. existing stats dicts."""
+
+    def __init__(self, name: str, documentation: str, labelnames, callback, type: str = "gauge"):
+        self.name = name
+        self.type = type
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback  # returns an iterable of (label values tuple, value)
+
+    def samples(self):
+        try:
+            values = list(self.callback())
+        except Exception as e:
+            logger.error("Metric %s callback failed: %s", self.name, e)
+            return
+        for key, value in values:
+            if value is not None:
+                yield self.name, _format_labels(self.labelnames, key), value
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+))
+STAGE_DURATION = registry.register(Histogram(
+    "handler_stage_duration_seconds", "Time spent in each stage of the index and chart handlers", ("handler", "stage")
+))
+UPSTREAM_DURATION = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Market data provider call latency by kind (quote, quotes, history, info)", ("kind", "outcome")
+))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "Database statement execution time by statement type", ("operation",)
+))
+TEMPLATE_RENDER_DURATION = registry.register(Histogram(
+    "template_render_duration_seconds", "Jinja2 template render time", ("template",)
+))
+EVENT_LOOP_LAG = registry.register(Histogram(
+    "event_loop_lag_seconds", "Delay between when the loop monitor should wake up and when it did",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+))
+
+# cache name -> callable returning a dict with "hits", "misses" and optionally "stale_hits"
+_cache_stats = {}
+
+def register_cache_stats(name: str, stats):
+    """Export hits, misses, stale hits and hit ratio for a cache (e.g. quote_cache.stats) under `cache="<name>"`."""
+    _cache_stats[name] = stats
+
+def _cache_samples(field: str):
+    for name, stats in _cache_stats.items():
+        current = stats()
+        if field == "ratio":
+            # Stale hits were still served from the cache, so they count as hits
+            served = current["hits"] + current.get("stale_hits", 0)
+            total = served + current["misses"]
+            yield (name,), served / total if total else None
+        elif field in current:
+            yield (name,), current[field]
+
+registry.register(CallbackMetric("cache_hits_total", "Cache hits on fresh entries", ("cache",), lambda: _cache_samples("hits"), type="counter"))
+registry.register(CallbackMetric("cache_stale_hits_total", "Cache hits on stale entries, served while they are refreshed", ("cache",), lambda: _cache_samples("stale_hits"), type="counter"))
+registry.register(CallbackMetric("cache_misses_total", "Cache misses", ("cache",), lambda: _cache_samples("misses"), type="counter"))
+registry.register(CallbackMetric("cache_hit_ratio", "Cache hits, fresh or stale, over all lookups since start", ("cache",), lambda: _cache_samples("ratio")))
+
+def register_stats_gauges(prefix: str, documentation: str, stats):
+    """Export every numeric value of a stats dict (e.g. get_executor_stats) as `<prefix>{field=...}`."""
+    def values():
+        for field, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield (field,), value
+
+    registry.register(CallbackMetric(prefix, documentation, ("field",), values))
+
+def instrument_engine(engine):
+    """Time every statement executed through a SQLAlchemy (async) engine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(context):
+        # Failed statements never reach after_cursor_execute
+        starts = context.connection.info.get("query_start_time") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+def instrument_templates(templates):
+    """Time Jinja2 rendering for every TemplateResponse built by a Jinja2Templates instance."""
+    template_response = templates.TemplateResponse
+
+    def timed_template_response(*args, **kwargs):
+        name = args[0] if args and isinstance(args[0], str) else kwargs.get("name", "unknown")
+        with TEMPLATE_RENDER_DURATION.time(template=name):
+            return template_response(*args, **kwargs)
+
+    templates.TemplateResponse = timed_template_response
+    return templates
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    """Sleep for `interval` in a loop and record how late each wake-up is."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - expected, 0.0))
+
+def start_event_loop_monitor() -> asyncio.Task:
+    return asyncio.create_task(monitor_event_loop_lag())
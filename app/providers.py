@@ -0,0 +1,353 @@
+import os, sys, json, time, random, logging, threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import pandas as pd
+import yfinance as yf
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Market data provider configuration
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+REPLAY_DATA_DIR = os.getenv("REPLAY_DATA_DIR", "./replay_data")
+REPLAY_LATENCY = float(os.getenv("REPLAY_LATENCY", "0"))
+REPLAY_LATENCY_JITTER = float(os.getenv("REPLAY_LATENCY_JITTER", "0"))
+QUOTE_METADATA_TTL = float(os.getenv("QUOTE_METADATA_TTL", "86400"))
+QUOTE_METADATA_CONCURRENCY = int(os.getenv("QUOTE_METADATA_CONCURRENCY", "4"))
+
+# Calendar lookback for each chart period; "5d" means the last five trading days
+PERIOD_LOOKBACK = {
+    "5d": timedelta(days=14),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "max": None
+}
+
+class MarketDataProvider(ABC):
+    """
+    Source of quotes, price history and company info. All methods are blocking and
+    are called through run_upstream/run_blocking, never directly on the event loop.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def get_quote(self, symbol: str):
+        """Return one quote dict (the shape used by the index page), or None when unavailable."""
+
+    @abstractmethod
+    def get_quotes(self, symbols):
+        """
+        Return quotes for many symbols at once.
+
+        Returns:
+            Tuple of (dict of symbol -> quote for the symbols found, number of upstream calls made)
+        """
+
+    @abstractmethod
+    def get_history(self, symbol: str, period: str = None, start: str = None):
+        """Return daily bars (Open, High, Low, Close, Volume) for a period or since a start date."""
+
+    @abstractmethod
+    def get_info(self, symbol: str):
+        """Return the company info dict (yfinance `.info` keys)."""
+
+def _symbol_bars(data, symbol: str):
+    """Pull one symbol's daily bars out of a `yf.download` frame, or None if it is missing."""
+    if data is None or data.empty:
+        return None
+    if isinstance(data.columns, pd.MultiIndex):
+        if symbol not in data.columns.get_level_values(0):
+            return None
+        bars = data[symbol]
+    else:
+        bars = data
+    bars = bars.dropna(subset=["Close"])
+    return None if bars.empty else bars
+
+def _quote_from_bars(symbol: str, bars, metadata: dict):
+    """
+    Build the quote dict used by the index page from recent daily bars plus cached metadata.
+
+    The 52-week range comes from the metadata, widened by the recent bars so a new
+    high or low shows up before the metadata is next refreshed.
+    """
+    price = float(bars["Close"].iloc[-1])
+    prev_close = float(bars["Close"].iloc[-2]) if len(bars) > 1 else price
+    change = price - prev_close
+    shares = metadata.get("shares_outstanding")
+
+    return {
+        "symbol": symbol,
+        "name": metadata.get("name") or symbol,
+        "price": price,
+        "change": change,
+        "percent_change": (change / prev_close) * 100 if prev_close else 0,
+        "volume": int(bars["Volume"].iloc[-1]),
+        "market_cap": shares * price if shares else metadata.get("market_cap"),
+        "fifty_two_week_low": min(low for low in (metadata.get("fifty_two_week_low"), float(bars["Low"].min())) if low is not None),
+        "fifty_two_week_high": max(high for high in (metadata.get("fifty_two_week_high"), float(bars["High"].max())) if high is not None),
+        "prev_close": prev_close,
+        "low": float(bars["Low"].iloc[-1]),
+        "high": float(bars["High"].iloc[-1])
+    }
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance via yfinance (the default)."""
+
+    name = "yfinance"
+
+    def __init__(self):
+        # Slow-changing per-symbol fields (name, shares outstanding, 52-week range) that the
+        # batch download does not return, fetched off the refresh path by a small pool of its own
+        self._metadata_cache = {}  # symbol -> (metadata, fetched_at)
+        self._metadata_pending = set()
+        self._metadata_lock = threading.Lock()
+        self._metadata_executor = ThreadPoolExecutor(max_workers=QUOTE_METADATA_CONCURRENCY, thread_name_prefix="metadata")
+
+    def get_quote(self, symbol: str):
+        try:
+            info = yf.Ticker(symbol).info
+
+            if not info or "regularMarketPrice" not in info:
+                return None
+
+            return {
+                "symbol": symbol,
+                "name": info.get("shortName") or info.get("longName") or symbol,
+                "price": info.get("regularMarketPrice"),
+                "change": info.get("regularMarketChange", 0),
+                "percent_change": info.get("regularMarketChangePercent", 0),
+                "volume": info.get("regularMarketVolume"),
+                "market_cap": info.get("marketCap"),
+                "fifty_two_week_low": info.get("fiftyTwoWeekLow"),
+                "fifty_two_week_high": info.get("fiftyTwoWeekHigh"),
+                "prev_close": info.get("regularMarketPreviousClose", 0),
+                "low": info.get("regularMarketDayLow", 0),
+                "high": info.get("regularMarketDayHigh", 0)
+            }
+        except IndexError as e:
+            logger.error(f"Index error processing {symbol}: {str(e)}")
+            return {
+                "symbol": symbol,
+                "name": symbol,
+                "price": 0,
+                "change": 0,
+                "percent_change": 0,
+                "volume": 0,
+                "market_cap": 0,
+                "fifty_two_week_low": 0,
+                "fifty_two_week_high": 0,
+                "prev_close": 0,
+                "low": 0,
+                "high": 0
+            }
+        except Exception as e:
+            logger.error(f"Error processing {symbol}: {str(e)}")
+            return None
+
+    def fetch_quote_metadata(self, symbol: str):
+        """Fetch and cache a symbol's `.info` fields used by quotes. Blocking."""
+        try:
+            info = yf.Ticker(symbol).info or {}
+            metadata = {
+                "name": info.get("shortName") or info.get("longName") or symbol,
+                "shares_outstanding": info.get("sharesOutstanding"),
+                "market_cap": info.get("marketCap"),
+                "fifty_two_week_low": info.get("fiftyTwoWeekLow"),
+                "fifty_two_week_high": info.get("fiftyTwoWeekHigh")
+            }
+        except Exception as e:
+            logger.error(f"Error fetching metadata for {symbol}: {str(e)}")
+            metadata = {"name": symbol}
+        self._metadata_cache[symbol] = (metadata, time.monotonic())
+        with self._metadata_lock:
+            self._metadata_pending.discard(symbol)
+        return metadata
+
+    def get_quote_metadata(self, symbol: str):
+        """
+        Return (metadata, upstream_calls) for a symbol without waiting on upstream.
+
+        Missing or expired metadata is fetched in the background, at most
+        QUOTE_METADATA_CONCURRENCY symbols at a time; until it arrives the cached
+        copy (or just the symbol as its name) is returned.
+        """
+        entry = self._metadata_cache.get(symbol)
+        if entry is not None and time.monotonic() - entry[1] <= QUOTE_METADATA_TTL:
+            return entry[0], 0
+
+        with self._metadata_lock:
+            if symbol in self._metadata_pending:
+                return (entry[0] if entry else {"name": symbol}), 0
+            self._metadata_pending.add(symbol)
+        self._metadata_executor.submit(self.fetch_quote_metadata, symbol)
+        return (entry[0] if entry else {"name": symbol}), 1
+
+    def get_quotes(self, symbols):
+        """
+        Fetch quotes for many symbols with one batched `yf.download` of the last
+        few daily bars; the 52-week range comes from the cached metadata.
+        """
+        symbols = list(symbols)
+        quotes = {}
+        if not symbols:
+            return quotes, 0
+
+        try:
+            data = yf.download(
+                symbols, period="5d", interval="1d", group_by="ticker",
+                auto_adjust=False, threads=True, progress=False
+            )
+        except Exception as e:
+            logger.error(f"Batch quote download error: {str(e)}")
+            data = None
+        upstream_calls = 1
+
+        for symbol in symbols:
+            bars = _symbol_bars(data, symbol)
+            if bars is None:
+                continue
+            try:
+                metadata, metadata_calls = self.get_quote_metadata(symbol)
+                upstream_calls += metadata_calls
+                quotes[symbol] = _quote_from_bars(symbol, bars, metadata)
+            except Exception as e:
+                logger.error(f"Error processing {symbol}: {str(e)}")
+
+        return quotes, upstream_calls
+
+    def get_history(self, symbol: str, period: str = None, start: str = None):
+        if start is not None:
+            return yf.Ticker(symbol).history(interval="1d", start=start)
+        return yf.Ticker(symbol).history(interval="1d", period=period)
+
+    def get_info(self, symbol: str):
+        return yf.Ticker(symbol).info
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves recorded market data from local files, with optional synthetic latency,
+    for load tests and deterministic benchmarks.
+
+    Layout of `data_dir`:
+        quotes.json          {symbol: quote dict}
+        info.json            {symbol: info dict}
+        history/SYMBOL.csv   Date,Open,High,Low,Close,Volume
+    """
+
+    name = "replay"
+
+    def __init__(self, data_dir: str = REPLAY_DATA_DIR, latency: float = REPLAY_LATENCY, jitter: float = REPLAY_LATENCY_JITTER):
+        self.data_dir = data_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.reload()
+
+    def reload(self):
+        """Re-read the recorded files, e.g. after the directory has been re-recorded."""
+        self._quotes = self._load_json("quotes.json")
+        self._info = self._load_json("info.json")
+        self._history = {}
+
+    def _load_json(self, filename: str):
+        path = os.path.join(self.data_dir, filename)
+        if not os.path.exists(path):
+            logger.warning(f"Replay file not found: {path}")
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _sleep(self):
+        delay = self.latency + random.uniform(0, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_quote(self, symbol: str):
+        self._sleep()
+        quote = self._quotes.get(symbol.upper())
+        return {**quote, "symbol": symbol} if quote else None
+
+    def get_quotes(self, symbols):
+        self._sleep()
+        quotes = {}
+        for symbol in symbols:
+            quote = self._quotes.get(symbol.upper())
+            if quote:
+                quotes[symbol] = {**quote, "symbol": symbol}
+        return quotes, 1
+
+    def get_history(self, symbol: str, period: str = None, start: str = None):
+        self._sleep()
+        symbol = symbol.upper()
+        if symbol not in self._history:
+            path = os.path.join(self.data_dir, "history", f"{symbol}.csv")
+            if os.path.exists(path):
+                self._history[symbol] = pd.read_csv(path, index_col="Date", parse_dates=True)
+            else:
+                self._history[symbol] = pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"], index=pd.DatetimeIndex([], name="Date"))
+        hist = self._history[symbol]
+
+        if start is not None:
+            return hist[hist.index >= pd.Timestamp(start)]
+        if hist.empty or period in (None, "max"):
+            return hist
+        if period == "5d":
+            return hist.tail(5)
+
+        # Same calendar lookbacks as the chart page, measured back from the last recorded bar
+        return hist[hist.index >= hist.index[-1] - PERIOD_LOOKBACK[period]]
+
+    def get_info(self, symbol: str):
+        self._sleep()
+        return self._info.get(symbol.upper(), {})
+
+def record(symbols, data_dir: str = REPLAY_DATA_DIR, source: MarketDataProvider = None):
+    """Record quotes, info and full daily history for `symbols` into a replay directory."""
+    source = source or YFinanceProvider()
+    os.makedirs(os.path.join(data_dir, "history"), exist_ok=True)
+
+    if isinstance(source, YFinanceProvider):
+        # Fetch names and 52-week ranges up front rather than in the background
+        for symbol in symbols:
+            source.fetch_quote_metadata(symbol)
+    quotes, _ = source.get_quotes(symbols)
+    info = {}
+    for symbol in symbols:
+        info[symbol] = source.get_info(symbol)
+        hist = source.get_history(symbol, period="max")
+        hist.index = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+        hist.index.name = "Date"
+        hist[["Open", "High", "Low", "Close", "Volume"]].to_csv(os.path.join(data_dir, "history", f"{symbol}.csv"))
+
+    with open(os.path.join(data_dir, "quotes.json"), "w") as f:
+        json.dump(quotes, f)
+    with open(os.path.join(data_dir, "info.json"), "w") as f:
+        json.dump(info, f, default=str)
+
+def _create_provider():
+    if MARKET_DATA_PROVIDER == "replay":
+        logger.info(f"Using replay market data from {REPLAY_DATA_DIR}")
+        return ReplayProvider()
+    if MARKET_DATA_PROVIDER != "yfinance":
+        logger.warning(f"Unknown MARKET_DATA_PROVIDER {MARKET_DATA_PROVIDER}, using yfinance")
+    return YFinanceProvider()
+
+# Process-wide provider used by the quote cache, history store and chart page
+market_data = _create_provider()
+
+if __name__ == "__main__":
+    # Usage: python -m app.providers record [--dir DIR] SYMBOL [SYMBOL ...]
+    args = sys.argv[1:]
+    if not args or args[0] != "record":
+        sys.exit("Usage: python -m app.providers record [--dir DIR] SYMBOL [SYMBOL ...]")
+    args = args[1:]
+    data_dir = REPLAY_DATA_DIR
+    if args[:1] == ["--dir"]:
+        data_dir, args = args[1], args[2:]
+    record([symbol.upper() for symbol in args], data_dir)
@@ -0,0 +1,369 @@
+import asyncio, os, time, logging
+from collections import OrderedDict
+from datetime import datetime
+from .executor import UPSTREAM_TIMEOUT
+from .providers import market_data
+from .singleflight import run_upstream
+from .ranking import QuoteRanking
+from .viewmodels import QuoteView
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Quote cache configuration
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "60"))
+QUOTE_CACHE_MAX_SIZE = int(os.getenv("QUOTE_CACHE_MAX_SIZE", "1000"))
+QUOTE_REFRESH_INTERVAL = float(os.getenv("QUOTE_REFRESH_INTERVAL", "30"))
+QUOTE_ACTIVE_TTL = float(os.getenv("QUOTE_ACTIVE_TTL", "900"))
+QUOTE_STALE_WHILE_REVALIDATE = os.getenv("QUOTE_STALE_WHILE_REVALIDATE", "true").lower() in ("1", "true", "yes")
+QUOTE_FETCH_CONCURRENCY = int(os.getenv("QUOTE_FETCH_CONCURRENCY", "8"))
+QUOTE_SYMBOL_TIMEOUT = float(os.getenv("QUOTE_SYMBOL_TIMEOUT", "5"))
+QUOTE_PAGE_DEADLINE = float(os.getenv("QUOTE_PAGE_DEADLINE", "8"))
+QUOTE_STREAM_QUEUE_SIZE = int(os.getenv("QUOTE_STREAM_QUEUE_SIZE", "16"))
+
+# Fields pushed to live subscribers when they change
+QUOTE_UPDATE_FIELDS = ("price", "change", "percent_change", "volume", "low", "high")
+
+# Upstream call counters, across all fetches
+upstream_stats = {"calls": 0, "batch_calls": 0, "fallback_calls": 0}
+
+def fetch_quote(symbol: str):
+    """Fetch a single quote from the market data provider. Blocking; returns None when no price is available."""
+    return market_data.get_quote(symbol)
+
+def fetch_batch_quotes(symbols):
+    """
+    Fetch quotes for many symbols with one batched provider call. Blocking.
+
+    Returns:
+        Tuple of (dict of symbol -> quote for symbols found in the batch, number of upstream calls made)
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}, 0
+    quotes, upstream_calls = market_data.get_quotes(symbols)
+    upstream_stats["batch_calls"] += 1
+    upstream_stats["calls"] += upstream_calls
+    return quotes, upstream_calls
+
+async def fetch_quotes_concurrently(symbols, symbol_timeout: float = QUOTE_SYMBOL_TIMEOUT, deadline: float = None):
+    """
+    Fetch quotes one symbol at a time, concurrently, with at most QUOTE_FETCH_CONCURRENCY in flight.
+
+    Each symbol gets `symbol_timeout` seconds, cut short by the overall `deadline`
+    (a time.monotonic() value) so the whole fan-out never outlives it.
+
+    Returns:
+        Tuple of (dict of symbol -> quote, list of symbols that failed or ran late, number of upstream calls made)
+    """
+    semaphore = asyncio.Semaphore(QUOTE_FETCH_CONCURRENCY)
+
+    async def fetch_one(symbol):
+        async with semaphore:
+            timeout = symbol_timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                return symbol, None, 0
+            try:
+                return symbol, await run_upstream(("quote", symbol), fetch_quote, symbol, timeout=timeout), 1
+            except asyncio.TimeoutError:
+                logger.warning("Quote for %s missed its %.2fs deadline", symbol, timeout)
+                return symbol, None, 1
+            except Exception as e:
+                logger.error("Error fetching %s: %s", symbol, e)
+                return symbol, None, 1
+
+    quotes = {}
+    unavailable = []
+    upstream_calls = 0
+    for symbol, quote, calls in await asyncio.gather(*(fetch_one(symbol) for symbol in symbols)):
+        upstream_calls += calls
+        if quote:
+            quotes[symbol] = quote
+        else:
+            unavailable.append(symbol)
+
+    upstream_stats["fallback_calls"] += upstream_calls
+    upstream_stats["calls"] += upstream_calls
+    return quotes, unavailable, upstream_calls
+
+class QuoteCache:
+    """Process-wide quote cache keyed by symbol, with TTL staleness and LRU eviction."""
+
+    def __init__(self, ttl: float = QUOTE_CACHE_TTL, max_size: int = QUOTE_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # symbol -> (quote, fetched_at)
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.on_evict = None  # called with the symbol of each evicted entry
+
+    def get(self, symbol: str):
+        """Return (quote, is_stale) for a cached symbol, or None on a miss."""
+        entry = self._entries.get(symbol)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(symbol)
+        quote, fetched_at = entry
+        is_stale = time.monotonic() - fetched_at > self.ttl
+        if is_stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return quote, is_stale
+
+    def peek(self, symbol: str):
+        """Return the cached quote without touching LRU order or counters."""
+        entry = self._entries.get(symbol)
+        return entry[0] if entry else None
+
+    def entry(self, symbol: str):
+        """Return (quote, fetched_at as a time.monotonic() value) without touching LRU order or counters, or None."""
+        return self._entries.get(symbol)
+
+    def set(self, symbol: str, quote: QuoteView, fetched_at: float = None):
+        self._entries[symbol] = (quote, time.monotonic() if fetched_at is None else fetched_at)
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict:
+                self.on_evict(evicted)
+
+    def symbols(self):
+        return list(self._entries.keys())
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "stale_while_revalidate": QUOTE_STALE_WHILE_REVALIDATE
+        }
+
+quote_cache = QuoteCache()
+
+# Percent-change ranking of every cached symbol, kept in step with the cache
+quote_ranking = QuoteRanking()
+quote_cache.on_evict = quote_ranking.remove
+
+# Bumped whenever any cached quote changes, so rendered pages and fragments built
+# from the cache can be keyed by it; updated_at is when that last happened
+quote_snapshot = {"version": 0, "updated_at": datetime.now().replace(microsecond=0)}
+
+# One queue per live-update subscriber (SSE connection)
+_subscribers = set()
+
+def subscribe_quotes() -> asyncio.Queue:
+    queue = asyncio.Queue(maxsize=QUOTE_STREAM_QUEUE_SIZE)
+    _subscribers.add(queue)
+    return queue
+
+def unsubscribe_quotes(queue: asyncio.Queue):
+    _subscribers.discard(queue)
+
+def _publish(changes: dict):
+    """Fan a batch of changed quotes out to every subscriber, dropping the oldest batch for slow ones."""
+    if not changes or not _subscribers:
+        return
+    update = {"updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "quotes": changes}
+    for queue in list(_subscribers):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(update)
+
+def store_quotes(quotes: dict, fetched_at: dict = None):
+    """
+    Turn fetched quotes into pre-formatted QuoteViews, cache them and publish the
+    ones whose values changed. This is the only place quotes are formatted.
+
+    Args:
+        fetched_at: Optional symbol -> time.monotonic() of the original fetch, for
+            quotes fetched elsewhere; by default they count as fetched now
+    """
+    changes = {}
+    snapshot_changed = False
+    for symbol, quote in quotes.items():
+        view = QuoteView.from_quote(quote)
+        previous = quote_cache.peek(symbol)
+        if previous != view:
+            snapshot_changed = True
+        if previous is None or any(getattr(previous, f) != getattr(view, f) for f in QUOTE_UPDATE_FIELDS):
+            changes[symbol] = view.to_dict(QUOTE_UPDATE_FIELDS)
+        quote_cache.set(symbol, view, fetched_at.get(symbol) if fetched_at else None)
+        quote_ranking.update(symbol, view.percent_change)
+    if snapshot_changed:
+        quote_snapshot["version"] += 1
+        quote_snapshot["updated_at"] = datetime.now().replace(microsecond=0)
+    _publish(changes)
+
+# Symbols requested by pages but not yet fetched by the refresher
+_pending_symbols = set()
+_refresh_requested = asyncio.Event()
+
+# Symbol -> when a page last asked for it; the refresher keeps these warm for QUOTE_ACTIVE_TTL
+_active_symbols = {}
+
+def _touch(symbols):
+    now = time.monotonic()
+    for symbol in symbols:
+        _active_symbols[symbol] = now
+
+def active_symbols():
+    """Symbols requested within the last QUOTE_ACTIVE_TTL seconds, forgetting older ones."""
+    cutoff = time.monotonic() - QUOTE_ACTIVE_TTL
+    for symbol in [symbol for symbol, requested_at in _active_symbols.items() if requested_at < cutoff]:
+        del _active_symbols[symbol]
+    return set(_active_symbols)
+
+async def refresh_quotes(symbols, deadline: float = None):
+    """
+    Fetch the given symbols and store them in the cache.
+
+    One batched download covers most symbols; anything missing from it is fetched
+    per symbol, concurrently, within `deadline` (a time.monotonic() value).
+
+    Returns:
+        Tuple of (dict of symbol -> quote, list of symbols that could not be fetched, number of upstream calls made)
+    """
+    symbols = list(symbols)
+    timeout = UPSTREAM_TIMEOUT if deadline is None else max(deadline - time.monotonic(), 0)
+    try:
+        fetched, upstream_calls = await run_upstream(("quotes", tuple(sorted(symbols))), fetch_batch_quotes, symbols, timeout=timeout)
+    except Exception as e:
+        logger.error("Batch quote fetch failed: %s", e)
+        fetched, upstream_calls = {}, 1
+
+    store_quotes(fetched)
+
+    missing = [symbol for symbol in symbols if symbol not in fetched]
+    unavailable = []
+    if missing:
+        fallback, unavailable, fallback_calls = await fetch_quotes_concurrently(missing, deadline=deadline)
+        store_quotes(fallback)
+        fetched.update(fallback)
+        upstream_calls += fallback_calls
+    return fetched, unavailable, upstream_calls
+
+def request_refresh(symbols):
+    """Queue symbols for the background refresher without waiting for it."""
+    _pending_symbols.update(symbols)
+    _refresh_requested.set()
+
+async def quote_refresher(base_symbols, on_refreshed=None, skip=None):
+    """
+    Keep the base symbols and every recently requested symbol warm.
+
+    Args:
+        base_symbols: Symbols refreshed on every cycle
+        on_refreshed: Optional callable run after each cycle with the dict of quotes
+            fetched in it, e.g. to publish them to other workers
+        skip: Optional callable returning symbols kept fresh by someone else, which are not fetched
+    """
+    while True:
+        _refresh_requested.clear()
+        symbols = set(base_symbols) | active_symbols() | _pending_symbols
+        _pending_symbols.clear()
+        if skip is not None:
+            symbols -= set(skip())
+
+        started = time.monotonic()
+        try:
+            fetched = {}
+            if symbols:
+                fetched, _, upstream_calls = await refresh_quotes(sorted(symbols))
+                logger.info("Refreshed %d quotes in %.2fs (%d upstream calls)", len(symbols), time.monotonic() - started, upstream_calls)
+            if on_refreshed is not None:
+                on_refreshed(fetched)
+        except Exception as e:
+            logger.error("Quote refresh error: %s", e)
+
+        try:
+            await asyncio.wait_for(_refresh_requested.wait(), timeout=QUOTE_REFRESH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+def start_quote_refresher(base_symbols, on_refreshed=None, skip=None) -> asyncio.Task:
+    return asyncio.create_task(quote_refresher(base_symbols, on_refreshed, skip))
+
+async def get_quotes(symbols, fetch_missing: bool = True):
+    """
+    Read quotes for the given symbols from the cache.
+
+    With `fetch_missing` False, symbols that are not cached are reported as
+    unavailable and never fetched or added to the refresher's set.
+
+    With stale-while-revalidate enabled, stale entries are served as-is and missing
+    symbols are reported as unavailable; both are handed to the background refresher
+    so the caller never waits on the upstream provider. Otherwise stale or missing
+    quotes are fetched inline within QUOTE_PAGE_DEADLINE, falling back to the stale
+    copy for anything that does not arrive in time.
+
+    Every returned QuoteView carries a `stale` flag.
+
+    Returns:
+        Tuple of (list of QuoteViews, immutable and shared between requests,
+        list of symbols with no data, number of upstream calls made)
+    """
+    results = []
+    stale = {}
+    to_refresh = []
+    unknown = []
+    for symbol in symbols:
+        cached = quote_cache.get(symbol)
+        if cached is None and not fetch_missing:
+            unknown.append(symbol)
+            continue
+        if cached is not None:
+            quote, is_stale = cached
+            if not is_stale:
+                results.append(quote)
+                continue
+            stale[symbol] = quote
+        to_refresh.append(symbol)
+
+    _touch(symbol for symbol in symbols if symbol not in unknown)
+    if not to_refresh:
+        return results, unknown, 0
+
+    if QUOTE_STALE_WHILE_REVALIDATE:
+        request_refresh(to_refresh)
+        results.extend(quote.as_stale() for quote in stale.values())
+        return results, unknown + [symbol for symbol in to_refresh if symbol not in stale], 0
+
+    fetched, _, upstream_calls = await refresh_quotes(to_refresh, deadline=time.monotonic() + QUOTE_PAGE_DEADLINE)
+    unavailable = unknown
+    for symbol in to_refresh:
+        if symbol in fetched:
+            # Normally the view just stored; rebuilt if a small cache already evicted it
+            results.append(quote_cache.peek(symbol) or QuoteView.from_quote(fetched[symbol]))
+        elif symbol in stale:
+            results.append(stale[symbol].as_stale())
+        else:
+            unavailable.append(symbol)
+    return results, unavailable, upstream_calls
+
+async def get_ranked_quotes(symbols, fetch_missing: bool = True):
+    """
+    Like get_quotes, but split into gainers and losers in the order kept by quote_ranking.
+
+    Returns:
+        Tuple of (gainers, best first, losers, smallest loss first,
+        list of symbols with no data, number of upstream calls made)
+    """
+    results, unavailable, upstream_calls = await get_quotes(symbols, fetch_missing)
+    by_symbol = {quote.symbol: quote for quote in results}
+    gainers = [by_symbol[symbol] for symbol in quote_ranking.gainers(symbols=by_symbol)]
+    losers = [by_symbol[symbol] for symbol in reversed(quote_ranking.losers(symbols=by_symbol))]
+    return gainers, losers, unavailable, upstream_calls
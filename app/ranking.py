@@ -0,0 +1,52 @@
+from bisect import bisect_left, insort
+
+class QuoteRanking:
+    """
+    Symbols ordered by percent change, maintained incrementally as quotes update.
+
+    Entries live in a sorted list of (percent_change, symbol) keys: updates locate
+    the old key with a binary search (O(log n)) and top-K gainers or losers are read
+    straight off either end of the list in O(k), so nothing is re-sorted per request.
+    """
+
+    def __init__(self):
+        self._keys = []  # sorted (percent_change, symbol)
+        self._by_symbol = {}  # symbol -> key currently in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, symbol: str, percent_change):
+        key = (float(percent_change or 0), symbol)
+        old_key = self._by_symbol.get(symbol)
+        if old_key == key:
+            return
+        if old_key is not None:
+            del self._keys[bisect_left(self._keys, old_key)]
+        insort(self._keys, key)
+        self._by_symbol[symbol] = key
+
+    def remove(self, symbol: str):
+        old_key = self._by_symbol.pop(symbol, None)
+        if old_key is not None:
+            del self._keys[bisect_left(self._keys, old_key)]
+
+    def gainers(self, k: int = None, symbols=None):
+        """Symbols with percent change >= 0, best first, optionally limited to `symbols`."""
+        result = []
+        for percent_change, symbol in reversed(self._keys):
+            if percent_change < 0 or (k is not None and len(result) >= k):
+                break
+            if symbols is None or symbol in symbols:
+                result.append(symbol)
+        return result
+
+    def losers(self, k: int = None, symbols=None):
+        """Symbols with percent change < 0, worst first, optionally limited to `symbols`."""
+        result = []
+        for percent_change, symbol in self._keys:
+            if percent_change >= 0 or (k is not None and len(result) >= k):
+                break
+            if symbols is None or symbol in symbols:
+                result.append(symbol)
+        return result
@@ -0,0 +1,140 @@
+import os, time, asyncio, hashlib, secrets, logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete
+from .db import AsyncSessionLocal, AdminSession
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Admin session configuration. Sessions must be shared ("database") when running
+# more than one worker, otherwise a login is only known to the worker that handled it.
+ADMIN_SESSION_BACKEND = os.getenv("ADMIN_SESSION_BACKEND", "database")
+ADMIN_SESSION_TTL = int(os.getenv("ADMIN_SESSION_TTL", "3600"))  # also the cookie max_age
+ADMIN_SESSION_SWEEP_INTERVAL = float(os.getenv("ADMIN_SESSION_SWEEP_INTERVAL", "300"))
+
+def _hash_token(token: str) -> str:
+    # Only a digest is stored, so a leaked store does not hand out live sessions
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class SessionStore(ABC):
+    """Admin session tokens that expire `ttl` seconds after login."""
+
+    name = "base"
+
+    def __init__(self, ttl: int = ADMIN_SESSION_TTL):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def create(self) -> str:
+        """Start a session and return its token, to be sent as the session cookie."""
+
+    @abstractmethod
+    async def is_valid(self, token: str) -> bool:
+        """True if the token belongs to a session that has not expired."""
+
+    @abstractmethod
+    async def delete(self, token: str):
+        """End a session, e.g. on logout."""
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Remove expired sessions; returns how many were removed."""
+
+    def stats(self):
+        return {"backend": self.name, "ttl": self.ttl}
+
+    async def run_sweeper(self, interval: float = ADMIN_SESSION_SWEEP_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logger.info("Removed %d expired admin sessions", removed)
+            except Exception as e:
+                logger.error("Admin session sweep failed: %s", e)
+
+class MemorySessionStore(SessionStore):
+    """Per-process store; only correct with a single worker."""
+
+    name = "memory"
+
+    def __init__(self, ttl: int = ADMIN_SESSION_TTL):
+        super().__init__(ttl)
+        self._expires_at = {}  # token hash -> monotonic expiry time
+
+    async def create(self) -> str:
+        token = secrets.token_urlsafe(32)
+        self._expires_at[_hash_token(token)] = time.monotonic() + self.ttl
+        return token
+
+    async def is_valid(self, token: str) -> bool:
+        key = _hash_token(token)
+        expires_at = self._expires_at.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._expires_at[key]
+            return False
+        return True
+
+    async def delete(self, token: str):
+        self._expires_at.pop(_hash_token(token), None)
+
+    async def sweep(self) -> int:
+        now = time.monotonic()
+        expired = [key for key, expires_at in self._expires_at.items() if expires_at <= now]
+        for key in expired:
+            del self._expires_at[key]
+        return len(expired)
+
+    def stats(self):
+        return {**super().stats(), "size": len(self._expires_at)}
+
+class DatabaseSessionStore(SessionStore):
+    """Store in the admin_sessions table, shared by every worker using the same database."""
+
+    name = "database"
+
+    async def create(self) -> str:
+        token = secrets.token_urlsafe(32)
+        async with AsyncSessionLocal() as session:
+            session.add(AdminSession(
+                token_hash=_hash_token(token),
+                expires_at=datetime.now() + timedelta(seconds=self.ttl)
+            ))
+            await session.commit()
+        return token
+
+    async def is_valid(self, token: str) -> bool:
+        # Primary key lookup
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(AdminSession.expires_at).where(AdminSession.token_hash == _hash_token(token))
+            )
+            expires_at = result.scalar_one_or_none()
+        return expires_at is not None and expires_at > datetime.now()
+
+    async def delete(self, token: str):
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(AdminSession).where(AdminSession.token_hash == _hash_token(token)))
+            await session.commit()
+
+    async def sweep(self) -> int:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(delete(AdminSession).where(AdminSession.expires_at <= datetime.now()))
+            await session.commit()
+        return result.rowcount or 0
+
+def _create_session_store():
+    if ADMIN_SESSION_BACKEND == "memory":
+        return MemorySessionStore()
+    if ADMIN_SESSION_BACKEND != "database":
+        logger.warning("Unknown ADMIN_SESSION_BACKEND %s, using database", ADMIN_SESSION_BACKEND)
+    return DatabaseSessionStore()
+
+# Process-wide admin session store used by the admin login, logout and verify_admin
+admin_sessions = _create_session_store()
+
+def start_session_sweeper() -> asyncio.Task:
+    return asyncio.create_task(admin_sessions.run_sweeper())
@@ -0,0 +1,244 @@
+import os, mmap, time, fcntl, struct, asyncio, logging
+from .quotes import quote_cache, quote_snapshot, store_quotes, quote_refresher, start_quote_refresher
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# Shared quote snapshot configuration. With a path set, one worker (whichever holds the
+# lock file) fetches quotes and publishes them to the file; the others only read it.
+QUOTE_SHARED_SNAPSHOT = os.getenv("QUOTE_SHARED_SNAPSHOT", "")
+QUOTE_SHARED_CAPACITY = int(os.getenv("QUOTE_SHARED_CAPACITY", "1024"))
+QUOTE_SHARED_POLL_INTERVAL = float(os.getenv("QUOTE_SHARED_POLL_INTERVAL", "0.5"))
+
+MAGIC = b"QSNP"
+LAYOUT_VERSION = 2
+
+# Header: magic, layout version, sequence, snapshot version, published at (epoch), count, capacity, writer pid.
+# The sequence is odd while the writer is mid-update (a seqlock), so readers never take locks.
+HEADER = struct.Struct("<4sIQQdIII")
+HEADER_SIZE = 64
+SEQUENCE_OFFSET = 8
+SEQUENCE = struct.Struct("<Q")
+
+# One fixed-size record per symbol: symbol, name, when it was fetched (epoch), then the raw
+# quote numbers (NaN for missing). Readers keep the fetch time, so staleness carries over.
+RECORD = struct.Struct("<16s64sd10d")
+RECORD_FIELDS = (
+    "price", "change", "percent_change", "volume", "market_cap",
+    "fifty_two_week_low", "fifty_two_week_high", "prev_close", "low", "high"
+)
+
+NAN = float("nan")
+
+def _encode_text(value: str, size: int) -> bytes:
+    return (value or "").encode()[:size]
+
+def _decode_text(value: bytes) -> str:
+    return value.rstrip(b"\0").decode(errors="ignore")
+
+def _number(value):
+    return NAN if value is None else float(value)
+
+class SharedQuoteSnapshot:
+    """
+    Fixed-layout quote snapshot in a memory-mapped file, written by one process and
+    read by the others.
+
+    The writer is whichever process holds an exclusive flock on `<path>.lock`. It
+    bumps the sequence to an odd value, rewrites the records, then bumps it back to
+    even. Readers check the 8-byte sequence on every poll and only decode the records,
+    straight out of the mapping, when it has moved; a read that overlaps a write sees
+    the sequence change and is retried.
+    """
+
+    def __init__(self, path: str = QUOTE_SHARED_SNAPSHOT, capacity: int = QUOTE_SHARED_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self.size = HEADER_SIZE + capacity * RECORD.size
+        self.is_writer = False
+        self._lock_file = None
+        self._file = None
+        self._map = None
+        self._last_sequence = None
+        self._fetched_at = {}  # symbol -> epoch fetch time, from the last snapshot read
+        self._counters = {"publishes": 0, "reads": 0, "read_retries": 0, "truncated": 0}
+
+    # Writer election
+
+    def try_become_writer(self) -> bool:
+        """Take the writer lock if no other process holds it; the lock lasts as long as this process."""
+        if self.is_writer:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(self.path + ".lock", "a+b")
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        self._open_for_writing()
+        self.is_writer = True
+        logger.info("Process %d is the shared quote snapshot writer for %s", os.getpid(), self.path)
+        return True
+
+    def _open_for_writing(self):
+        self.close_map()
+        self._file = open(self.path, "a+b")
+        # Grow, never truncate: readers may have the file mapped
+        if os.fstat(self._file.fileno()).st_size < self.size:
+            self._file.truncate(self.size)
+        self._map = mmap.mmap(self._file.fileno(), self.size)
+        magic, layout, sequence, *_ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            sequence = 0
+        # Carry on from the previous writer's sequence so readers see a change; fix up a torn write
+        sequence += 2 if sequence % 2 == 0 else 1
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION, sequence, 0, 0.0, 0, self.capacity, os.getpid())
+
+    def _open_for_reading(self) -> bool:
+        if self._map is not None:
+            return True
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        if os.fstat(self._file.fileno()).st_size < HEADER_SIZE:
+            self._file.close()
+            self._file = None
+            return False
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return True
+
+    def close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # Writing
+
+    def publish(self, fetched):
+        """
+        Write the quotes fetched in this refresh cycle (up to capacity) as a new snapshot.
+        Symbols that failed to refresh are left out, so readers fetch them themselves.
+        """
+        symbols = [symbol for symbol in fetched if quote_cache.entry(symbol) is not None]
+        if len(symbols) > self.capacity:
+            self._counters["truncated"] += len(symbols) - self.capacity
+            symbols = symbols[:self.capacity]
+
+        mm = self._map
+        sequence = SEQUENCE.unpack_from(mm, SEQUENCE_OFFSET)[0] + 1
+        SEQUENCE.pack_into(mm, SEQUENCE_OFFSET, sequence)  # odd: write in progress
+
+        # Cache times are time.monotonic(); the file holds epoch times, comparable across processes
+        to_epoch = time.time() - time.monotonic()
+        count = 0
+        for symbol in symbols:
+            view, fetched_at = quote_cache.entry(symbol)
+            RECORD.pack_into(
+                mm, HEADER_SIZE + count * RECORD.size,
+                _encode_text(symbol, 16), _encode_text(view.name, 64), fetched_at + to_epoch,
+                *(_number(getattr(view, field)) for field in RECORD_FIELDS)
+            )
+            count += 1
+
+        HEADER.pack_into(
+            mm, 0, MAGIC, LAYOUT_VERSION, sequence + 1, quote_snapshot["version"], time.time(),
+            count, self.capacity, os.getpid()
+        )  # even again: snapshot complete
+        self._counters["publishes"] += 1
+
+    # Reading
+
+    def read(self, retries: int = 10):
+        """
+        Returns:
+            Tuple of (dict of symbol -> quote, dict of symbol -> epoch fetch time) if the
+            snapshot changed since the last read, otherwise None
+        """
+        if not self._open_for_reading():
+            return None
+        mm = self._map
+        for _ in range(retries):
+            sequence = SEQUENCE.unpack_from(mm, SEQUENCE_OFFSET)[0]
+            if sequence == self._last_sequence:
+                return None
+            if sequence % 2:
+                self._counters["read_retries"] += 1
+                time.sleep(0)
+                continue
+
+            magic, layout, _, _, _, count, capacity, _ = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or layout != LAYOUT_VERSION:
+                return None
+            count = min(count, capacity, (len(mm) - HEADER_SIZE) // RECORD.size)
+            quotes = {}
+            fetched_at = {}
+            for i in range(count):
+                symbol, name, fetched, *values = RECORD.unpack_from(mm, HEADER_SIZE + i * RECORD.size)
+                quote = {field: (None if value != value else value) for field, value in zip(RECORD_FIELDS, values)}
+                if quote["volume"] is not None:
+                    quote["volume"] = int(quote["volume"])
+                quote["symbol"] = _decode_text(symbol)
+                quote["name"] = _decode_text(name)
+                quotes[quote["symbol"]] = quote
+                fetched_at[quote["symbol"]] = fetched
+
+            if SEQUENCE.unpack_from(mm, SEQUENCE_OFFSET)[0] == sequence:
+                self._last_sequence = sequence
+                self._fetched_at = fetched_at
+                self._counters["reads"] += 1
+                return quotes, fetched_at
+            self._counters["read_retries"] += 1
+        return None
+
+    def symbols(self):
+        """
+        Symbols in the last snapshot read that are still fresh; readers leave these to
+        the writer and fetch everything else, including snapshot quotes gone stale.
+        """
+        cutoff = time.time() - quote_cache.ttl
+        return {symbol for symbol, fetched_at in self._fetched_at.items() if fetched_at >= cutoff}
+
+    def stats(self):
+        return {
+            **self._counters,
+            "path": self.path,
+            "role": "writer" if self.is_writer else "reader",
+            "capacity": self.capacity,
+            "sequence": self._last_sequence,
+            "symbols": len(self._fetched_at)
+        }
+
+    # Worker loop
+
+    async def run(self, base_symbols):
+        """
+        Fetch and publish quotes if this process wins the writer lock. Otherwise follow
+        the snapshot, fetching only symbols it lacks, and take over if the writer exits.
+        """
+        if not self.try_become_writer():
+            local_refresher = start_quote_refresher((), skip=self.symbols)
+            try:
+                while not self.try_become_writer():
+                    snapshot = self.read()
+                    if snapshot:
+                        quotes, fetched_at = snapshot
+                        # Keep the writer's fetch times so the quotes age (and go stale) as they should
+                        to_monotonic = time.monotonic() - time.time()
+                        store_quotes(quotes, {symbol: t + to_monotonic for symbol, t in fetched_at.items()})
+                    await asyncio.sleep(QUOTE_SHARED_POLL_INTERVAL)
+            finally:
+                local_refresher.cancel()
+            self._fetched_at = {}
+        await quote_refresher(base_symbols, on_refreshed=self.publish)
+
+shared_quotes = SharedQuoteSnapshot() if QUOTE_SHARED_SNAPSHOT else None
+
+def start_shared_quote_refresher(base_symbols) -> asyncio.Task:
+    """Start the quote refresher, coordinated through the shared snapshot when QUOTE_SHARED_SNAPSHOT is set."""
+    if shared_quotes is None:
+        return start_quote_refresher(base_symbols)
+    return asyncio.create_task(shared_quotes.run(base_symbols))
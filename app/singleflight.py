@@ -0,0 +1,72 @@
+import asyncio, time
+from functools import partial
+from .executor import UPSTREAM_TIMEOUT, run_blocking
+from .metrics import UPSTREAM_DURATION
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key starts the call; everyone arriving while it runs
+    awaits the same result (or exception). The key is forgotten as soon as the call
+    finishes, so this never serves old results — it only removes duplicate work.
+    Each caller waits at most its own `timeout`; giving up does not stop the call,
+    which should carry its own overall time limit.
+    """
+
+    def __init__(self):
+        self._in_flight = {}  # key -> asyncio.Task
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, func, *args, timeout: float = None, **kwargs):
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(partial(self._finish, key))
+        # Shield so one caller disconnecting or timing out does not cancel the call for the others
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def _finish(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Every caller may have given up already; retrieve the exception so asyncio does not log it
+            task.exception()
+
+    def stats(self):
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
+
+upstream_flight = SingleFlight()
+
+async def _timed_upstream_call(kind: str, func, *args, **kwargs):
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        return await run_blocking(func, *args, **kwargs)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - started, kind=kind, outcome=outcome)
+
+async def run_upstream(key, func, *args, timeout: float = UPSTREAM_TIMEOUT, **kwargs):
+    """
+    Run a blocking upstream (yfinance) call via run_blocking, sharing it with any
+    concurrent caller that uses the same key, e.g. ("history", symbol, period).
+    The first element of the key is the kind recorded in the upstream latency histogram.
+
+    Each caller gives up after its own `timeout`, while the shared call itself runs
+    for up to UPSTREAM_TIMEOUT (or the starting caller's timeout, if longer), so a
+    caller with a short timeout does not cut the call short for everyone who joined it.
+    """
+    call_timeout = None if timeout is None else max(timeout, UPSTREAM_TIMEOUT)
+    call = partial(_timed_upstream_call, key[0], func, *args, timeout=call_timeout, **kwargs)
+    return await upstream_flight.do(key, call, timeout=timeout)
@@ -0,0 +1,118 @@
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+@lru_cache(maxsize=4096)
+def _format_number(value: float, include_dollar_sign: bool):
+    prefix = "$" if include_dollar_sign else ""
+    if value >= 1_000_000_000:  # Billions
+        return f"{prefix}{value / 1_000_000_000:.2f}B"
+    elif value >= 1_000_000:  # Millions
+        return f"{prefix}{value / 1_000_000:.2f}M"
+    else:
+        return f"{prefix}{value:.2f}"
+
+def format_monetary_value(value, include_dollar_sign=True):
+    """
+    Format monetary values or volume values to use M for millions and B for billions with 2 decimal places.
+
+    Repeated values (the same price seen by every viewer) are served from a small cache.
+
+    Args:
+        value: The numeric value to format
+        include_dollar_sign: Whether to include a dollar sign (for monetary values)
+
+    Returns:
+        Formatted string with M for millions, B for billions, limited to 2 decimal places
+    """
+    if value is None or value == "N/A":
+        return "N/A"
+
+    try:
+        # Convert to float if it's not already
+        return _format_number(float(value), bool(include_dollar_sign))
+    except (ValueError, TypeError):
+        return str(value)
+
+@dataclass(frozen=True, slots=True)
+class QuoteView:
+    """
+    Immutable, pre-formatted quote, built once when a quote is refreshed and shared
+    by every request and user, so rendering does no numeric formatting.
+    """
+
+    symbol: str
+    name: str
+    price: float
+    change: float
+    percent_change: float
+    volume: float
+    market_cap: float
+    fifty_two_week_low: float
+    fifty_two_week_high: float
+    prev_close: float
+    low: float
+    high: float
+
+    formatted_price: str
+    formatted_market_cap: str
+    formatted_volume: str
+    formatted_52_week_low: str
+    formatted_52_week_high: str
+    formatted_prev_close: str
+    formatted_low: str
+    formatted_high: str
+
+    # Sign and absolute values of the change, short (2 decimals) and full precision
+    change_sign: str
+    formatted_change: str
+    formatted_change_full: str
+    formatted_percent_change: str
+    formatted_percent_change_full: str
+
+    # Where the price sits in the day's low-high range, 0-100
+    day_range_percent: float
+
+    stale: bool = False
+
+    @classmethod
+    def from_quote(cls, quote: dict):
+        price = quote.get("price") or 0
+        change = quote.get("change") or 0
+        percent_change = quote.get("percent_change") or 0
+        low = quote.get("low") or 0
+        high = quote.get("high") or 0
+        day_range_percent = ((price - low) / (high - low)) * 100 if high > low else 50
+        return cls(
+            symbol=quote["symbol"],
+            name=quote.get("name") or quote["symbol"],
+            price=price,
+            change=change,
+            percent_change=percent_change,
+            volume=quote.get("volume"),
+            market_cap=quote.get("market_cap"),
+            fifty_two_week_low=quote.get("fifty_two_week_low"),
+            fifty_two_week_high=quote.get("fifty_two_week_high"),
+            prev_close=quote.get("prev_close"),
+            low=low,
+            high=high,
+            formatted_price=format_monetary_value(quote.get("price")),
+            formatted_market_cap=format_monetary_value(quote.get("market_cap")),
+            formatted_volume=format_monetary_value(quote.get("volume"), False),
+            formatted_52_week_low=format_monetary_value(quote.get("fifty_two_week_low")),
+            formatted_52_week_high=format_monetary_value(quote.get("fifty_two_week_high")),
+            formatted_prev_close=format_monetary_value(quote.get("prev_close")),
+            formatted_low=format_monetary_value(quote.get("low")),
+            formatted_high=format_monetary_value(quote.get("high")),
+            change_sign="+" if change > 0 else "-",
+            formatted_change=f"{abs(change):.2f}",
+            formatted_change_full=str(abs(change)),
+            formatted_percent_change=f"{abs(percent_change):.2f}",
+            formatted_percent_change_full=str(abs(percent_change)),
+            day_range_percent=min(max(day_range_percent, 0), 100)
+        )
+
+    def as_stale(self):
+        return self if self.stale else replace(self, stale=True)
+
+    def to_dict(self, fields):
+        return {field: getattr(self, field) for field in fields}
@@ -0,0 +1,150 @@
+import os, re, io, csv, json
+from typing import List
+from pydantic import BaseModel, Field
+from sqlalchemy import select, insert, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import TTLCache
+from .db import AsyncSessionLocal, Stock
+
+# Watchlist cache configuration
+WATCHLIST_CACHE_TTL = float(os.getenv("WATCHLIST_CACHE_TTL", "5"))
+WATCHLIST_CACHE_MAX_SIZE = int(os.getenv("WATCHLIST_CACHE_MAX_SIZE", "10000"))
+
+# Bulk import limits
+WATCHLIST_BULK_MAX_SYMBOLS = int(os.getenv("WATCHLIST_BULK_MAX_SYMBOLS", "1000"))
+WATCHLIST_IMPORT_MAX_BYTES = int(os.getenv("WATCHLIST_IMPORT_MAX_BYTES", str(256 * 1024)))
+
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9][A-Z0-9.^=-]{0,14}$")
+
+# Each user's tracked symbols, keyed by user id
+watchlist_cache = TTLCache(WATCHLIST_CACHE_TTL, WATCHLIST_CACHE_MAX_SIZE)
+
+async def get_user_symbols(session: AsyncSession, user_id):
+    """Return the user's tracked symbols, hitting the database only on a cache miss."""
+    symbols = watchlist_cache.get(user_id)
+    if symbols is None:
+        result = await session.execute(select(Stock.symbol).where(Stock.user_id == user_id))
+        symbols = tuple(row[0] for row in result.all())
+        watchlist_cache.set(user_id, symbols)
+    return list(symbols)
+
+def invalidate_user_symbols(user_id):
+    """Drop a user's cached watchlist after it changes."""
+    watchlist_cache.invalidate(user_id)
+
+class WatchlistChanges(BaseModel):
+    """Body of a bulk watchlist update; `replace` drops every tracked symbol not in `add`."""
+
+    add: List[str] = Field(default_factory=list, max_length=WATCHLIST_BULK_MAX_SYMBOLS)
+    remove: List[str] = Field(default_factory=list, max_length=WATCHLIST_BULK_MAX_SYMBOLS)
+    replace: bool = False
+
+def normalize_symbols(values):
+    """
+    Upper-case, de-duplicate (keeping order) and validate symbols.
+
+    Returns:
+        Tuple of (list of valid symbols, list of rejected values)
+    """
+    symbols = {}
+    invalid = []
+    for value in values:
+        symbol = value.strip().upper()
+        if not symbol:
+            continue
+        if SYMBOL_PATTERN.match(symbol):
+            symbols[symbol] = None
+        else:
+            invalid.append(value.strip())
+    return list(symbols), invalid
+
+def parse_symbol_text(text: str):
+    """Symbols separated by commas, whitespace or new lines."""
+    return normalize_symbols(re.split(r"[\s,;]+", text))
+
+def parse_symbol_csv(data: bytes):
+    """Symbols from a CSV upload: the "symbol" column if there is a header row, otherwise the first column."""
+    rows = [row for row in csv.reader(io.StringIO(data.decode("utf-8-sig", errors="replace"))) if row]
+    if not rows:
+        return [], []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = 0
+    if "symbol" in header:
+        column = header.index("symbol")
+        rows = rows[1:]
+    return normalize_symbols(row[column] for row in rows if len(row) > column)
+
+def _insert_ignoring_duplicates(dialect_name: str):
+    # One multi-row INSERT that skips symbols the user already tracks (unique user_id, symbol index)
+    if dialect_name == "postgresql":
+        return postgresql.insert(Stock).on_conflict_do_nothing(index_elements=["user_id", "symbol"])
+    if dialect_name == "sqlite":
+        return sqlite.insert(Stock).on_conflict_do_nothing(index_elements=["user_id", "symbol"])
+    return None
+
+async def apply_watchlist_changes(session: AsyncSession, user_id, add=(), remove=(), replace: bool = False):
+    """
+    Add and remove many symbols with set-based statements in a single transaction.
+
+    Args:
+        add: Symbols to track; ones already tracked are skipped by the database
+        remove: Symbols to stop tracking
+        replace: Also stop tracking every symbol that is not in `add`; refused (ValueError)
+            when `add` is empty, since it would empty the watchlist
+
+    Returns:
+        Tuple of (number of symbols added, number of symbols removed)
+    """
+    if replace and not add:
+        raise ValueError("Refusing to replace a watchlist with no symbols")
+    removed = 0
+    if replace:
+        result = await session.execute(delete(Stock).where(Stock.user_id == user_id, Stock.symbol.notin_(add)))
+        removed = result.rowcount
+    elif remove:
+        result = await session.execute(delete(Stock).where(Stock.user_id == user_id, Stock.symbol.in_(remove)))
+        removed = result.rowcount
+
+    added = 0
+    if add:
+        statement = _insert_ignoring_duplicates(session.get_bind().dialect.name)
+        if statement is None:
+            # No portable ON CONFLICT: leave out what is already tracked
+            existing = await session.execute(select(Stock.symbol).where(Stock.user_id == user_id, Stock.symbol.in_(add)))
+            tracked = {row[0] for row in existing.all()}
+            add = [symbol for symbol in add if symbol not in tracked]
+            statement = insert(Stock)
+        if add:
+            result = await session.execute(statement.values([{"user_id": user_id, "symbol": symbol} for symbol in add]))
+            added = result.rowcount
+
+    await session.commit()
+    if added or removed:
+        invalidate_user_symbols(user_id)
+    return added, removed
+
+async def stream_user_symbols(user_id, format: str = "csv"):
+    """
+    Yield a user's watchlist as CSV or JSON, reading rows in batches.
+
+    Uses its own database session, since the response outlives the request's.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            select(Stock.symbol).where(Stock.user_id == user_id).order_by(Stock.symbol).execution_options(yield_per=500)
+        )
+        if format == "json":
+            yield '{"symbols": ['
+            first = True
+            async for partition in result.partitions():
+                chunk = ", ".join(json.dumps(row[0]) for row in partition)
+                yield chunk if first else ", " + chunk
+                first = False
+            yield "]}\n"
+        else:
+            yield "symbol\r\n"
+            async for partition in result.partitions():
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(partition)
+                yield buffer.getvalue()
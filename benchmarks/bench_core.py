@@ -0,0 +1,52 @@
+import pytest
+
+from .fixtures import SCENARIO_SIZES, CHART_SYMBOL, scenario_symbols
+
+@pytest.fixture(scope="module")
+def history(client):
+    from app.providers import market_data
+    return market_data.get_history(CHART_SYMBOL, period="max")
+
+def bench_indicators_uncached(benchmark, history):
+    from app.indicators import _compute
+
+    benchmark(
+        _compute,
+        history["High"].to_numpy(dtype=float),
+        history["Low"].to_numpy(dtype=float),
+        history["Close"].to_numpy(dtype=float),
+        history["Volume"].to_numpy(dtype=float)
+    )
+
+def bench_indicators_cached(benchmark, history):
+    from app.indicators import compute_indicators
+    benchmark(compute_indicators, CHART_SYMBOL, "max", history)
+
+@pytest.mark.parametrize("symbol_count", SCENARIO_SIZES)
+def bench_ranking_update(benchmark, symbol_count):
+    from app.ranking import QuoteRanking
+
+    ranking = QuoteRanking()
+    symbols = scenario_symbols(symbol_count)
+    for i, symbol in enumerate(symbols):
+        ranking.update(symbol, i % 21 - 10)
+
+    def update_all():
+        for i, symbol in enumerate(symbols):
+            ranking.update(symbol, (i * 7) % 21 - 10 + update_all.round)
+        update_all.round = -update_all.round
+
+    update_all.round = 0.5
+    benchmark(update_all)
+
+@pytest.mark.parametrize("symbol_count", SCENARIO_SIZES)
+def bench_ranked_quotes(benchmark, client, symbol_count):
+    from app.quotes import get_ranked_quotes
+
+    symbols = scenario_symbols(symbol_count)
+    client.portal.call(get_ranked_quotes, symbols)  # warm the quote cache
+    benchmark(client.portal.call, get_ranked_quotes, symbols)
+
+def bench_format_monetary_value(benchmark):
+    from main import format_monetary_value
+    benchmark(lambda: [format_monetary_value(v) for v in (12.5, 3_400_000, 2_100_000_000, None)])
@@ -0,0 +1,35 @@
+import itertools
+import pytest
+
+from .fixtures import SCENARIO_SIZES, BENCH_PASSWORD, CHART_SYMBOL
+
+@pytest.mark.parametrize("symbol_count", SCENARIO_SIZES)
+def bench_index(benchmark, client, watchlist_users, symbol_count):
+    _, token = watchlist_users(symbol_count)
+    response = benchmark(client.get, "/", headers={"Cookie": f"auth={token}"})
+    assert response.status_code == 200
+
+@pytest.mark.parametrize("period", ["1mo", "1y", "max"])
+def bench_chart(benchmark, client, watchlist_users, period):
+    _, token = watchlist_users(SCENARIO_SIZES[0])
+    response = benchmark(client.get, f"/chart/{CHART_SYMBOL}?period={period}", headers={"Cookie": f"auth={token}"})
+    assert response.status_code == 200
+
+@pytest.mark.parametrize("symbol_count", SCENARIO_SIZES)
+def bench_add_stock(benchmark, client, watchlist_users, symbol_count):
+    _, token = watchlist_users(symbol_count)
+    counter = itertools.count()
+
+    def add_stock():
+        return client.post(
+            "/add-stock", data={"symbol": f"A{symbol_count}X{next(counter)}"},
+            headers={"Cookie": f"auth={token}"}, follow_redirects=False
+        )
+
+    response = benchmark(add_stock)
+    assert response.status_code == 303
+
+def bench_login(benchmark, client, watchlist_users):
+    email, _ = watchlist_users(SCENARIO_SIZES[0])
+    response = benchmark(client.post, "/auth/jwt/login", data={"username": email, "password": BENCH_PASSWORD})
+    assert response.status_code == 204
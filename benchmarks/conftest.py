@@ -0,0 +1,27 @@
+import tempfile
+import pytest
+
+from .fixtures import configure_environment, create_watchlist_user
+
+# Configure the app before the benchmark modules import it
+configure_environment(tempfile.mkdtemp(prefix="stock-bench-"))
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def watchlist_users(client):
+    """Lazily created users keyed by tracked symbol count, as (email, auth cookie value)."""
+    users = {}
+
+    def get(symbol_count: int):
+        if symbol_count not in users:
+            users[symbol_count] = client.portal.call(create_watchlist_user, symbol_count)
+        return users[symbol_count]
+
+    return get
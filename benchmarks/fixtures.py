@@ -0,0 +1,101 @@
+import os, json, uuid
+import numpy as np
+import pandas as pd
+
+# Shared setup for the pytest-benchmark suite and the load generator. Everything
+# here must run before `main` or any `app` module is imported, because their
+# configuration is read from the environment at import time.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tracked symbols per user in each scenario
+SCENARIO_SIZES = (10, 100, 1000)
+BENCH_PASSWORD = "benchmark-password"
+CHART_SYMBOL = "AAPL"
+HISTORY_DAYS = 2520  # about ten years of daily bars
+
+def scenario_symbols(count: int):
+    """Synthetic watchlist symbols for a scenario, e.g. B0000..B0999."""
+    return [f"B{i:04d}" for i in range(count)]
+
+def _random_walk_bars(rng, days: int):
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days, name="Date")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    open_ = close * (1 + rng.normal(0, 0.005, days))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, days)),
+        "Low": np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, days)),
+        "Close": close,
+        "Volume": rng.integers(100_000, 50_000_000, days)
+    }, index=dates)
+
+def write_replay_data(data_dir: str, symbols, history_symbols, seed: int = 42):
+    """
+    Write a deterministic replay directory (see app.providers.ReplayProvider).
+
+    Every symbol gets a quote and info; only `history_symbols` get full daily
+    history, since only the chart route reads it.
+    """
+    from app.providers import _quote_from_bars
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(data_dir, "history"), exist_ok=True)
+    quotes, info = {}, {}
+    for symbol in symbols:
+        days = HISTORY_DAYS if symbol in history_symbols else 260
+        bars = _random_walk_bars(rng, days)
+        name = f"{symbol} Benchmark Corp"
+        shares = int(rng.integers(10_000_000, 10_000_000_000))
+        quotes[symbol] = _quote_from_bars(symbol, bars.tail(260), {"name": name, "shares_outstanding": shares})
+        info[symbol] = {"shortName": name, "sharesOutstanding": shares, "currency": "USD", "exchange": "NMS"}
+        if symbol in history_symbols:
+            bars.to_csv(os.path.join(data_dir, "history", f"{symbol}.csv"))
+
+    with open(os.path.join(data_dir, "quotes.json"), "w") as f:
+        json.dump(quotes, f)
+    with open(os.path.join(data_dir, "info.json"), "w") as f:
+        json.dump(info, f)
+
+def configure_environment(workdir: str, latency: float = 0.0, jitter: float = 0.0):
+    """
+    Point the app at a fresh SQLite database and synthetic replay data in `workdir`.
+
+    Must be called before anything else imports `main`.
+    """
+    os.chdir(REPO_ROOT)
+    data_dir = os.path.join(workdir, "replay")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["MARKET_DATA_PROVIDER"] = "replay"
+    os.environ["REPLAY_DATA_DIR"] = data_dir
+    os.environ["REPLAY_LATENCY"] = str(latency)
+    os.environ["REPLAY_LATENCY_JITTER"] = str(jitter)
+    # Large enough that the biggest scenario does not evict the predefined tickers
+    os.environ.setdefault("QUOTE_CACHE_MAX_SIZE", str(max(SCENARIO_SIZES) * 2 + 100))
+
+    from main import TICKERS
+    from app.providers import market_data
+    if not os.path.exists(os.path.join(data_dir, "quotes.json")):
+        write_replay_data(data_dir, TICKERS + scenario_symbols(max(SCENARIO_SIZES)), set(TICKERS))
+        market_data.reload()
+
+async def create_watchlist_user(symbol_count: int):
+    """
+    Create a user tracking `symbol_count` synthetic symbols.
+
+    Returns:
+        Tuple of (email, auth cookie value)
+    """
+    from fastapi_users.db import SQLAlchemyUserDatabase
+    from main import UserCreate
+    from app.auth import UserManager, get_jwt_strategy
+    from app.db import AsyncSessionLocal, User, Stock
+
+    email = f"bench-{symbol_count}-{uuid.uuid4().hex[:8]}@example.com"
+    async with AsyncSessionLocal() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        user = await manager.create(UserCreate(email=email, password=BENCH_PASSWORD, is_active=True))
+        session.add_all(Stock(user_id=user.id, symbol=symbol) for symbol in scenario_symbols(symbol_count))
+        await session.commit()
+        token = await get_jwt_strategy().write_token(user)
+    return email, token
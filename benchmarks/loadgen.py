@@ -0,0 +1,196 @@
+"""
+In-process ASGI load generator for the main routes.
+
+Drives `/`, `/chart/{symbol}`, `/add-stock` and `/auth/jwt/login` through
+httpx's ASGI transport (no network, no server) against the replay market data
+provider and a throwaway SQLite database, once per watchlist size scenario.
+
+Usage:
+    python -m benchmarks.loadgen run [--sizes 10 100 1000] [--requests 200] [--concurrency 10] [--output results.json]
+    python -m benchmarks.loadgen compare baseline.json results.json [--threshold 0.10]
+"""
+import sys, json, time, asyncio, argparse, platform, tempfile, tracemalloc
+from datetime import datetime
+import numpy as np
+
+from .fixtures import SCENARIO_SIZES, BENCH_PASSWORD, CHART_SYMBOL, configure_environment, create_watchlist_user
+
+def _latency_summary(latencies, errors: int, elapsed: float):
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0, 0, 0)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0,
+        "mean_ms": float(ms.mean()) if len(ms) else 0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()) if len(ms) else 0
+    }
+
+async def _drive(client, make_request, total: int, concurrency: int):
+    """Issue `total` requests from `concurrency` workers; returns (latencies, errors, elapsed)."""
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            i = next_index
+            next_index += 1
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+def _routes(symbol_count: int, email: str, token: str):
+    """(name, request factory) for every benchmarked route in a scenario."""
+    cookie = {"Cookie": f"auth={token}"}
+
+    async def index(client, i):
+        return await client.get("/", headers=cookie)
+
+    async def chart(client, i):
+        return await client.get(f"/chart/{CHART_SYMBOL}?period=1y", headers=cookie)
+
+    async def login(client, i):
+        return await client.post("/auth/jwt/login", data={"username": email, "password": BENCH_PASSWORD})
+
+    async def add_stock(client, i):
+        # A new symbol each time, so every request takes the insert path
+        return await client.post("/add-stock", data={"symbol": f"N{symbol_count}X{i}"}, headers=cookie)
+
+    # /add-stock last: it grows the watchlist the other routes read
+    return [("GET /", index), ("GET /chart/{symbol}", chart), ("POST /auth/jwt/login", login), ("POST /add-stock", add_stock)]
+
+async def run_benchmarks(sizes, requests: int, concurrency: int, warmup: int, trace_memory: bool):
+    import httpx
+    from main import app
+
+    results = {}
+    if trace_memory:
+        tracemalloc.start()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for symbol_count in sizes:
+                email, token = await create_watchlist_user(symbol_count)
+                for name, make_request in _routes(symbol_count, email, token):
+                    await _drive(client, lambda c, i: make_request(c, requests + i), warmup, 1)
+
+                    if trace_memory:
+                        # Measured against this route's own starting point, so earlier routes do not count
+                        tracemalloc.reset_peak()
+                        before = tracemalloc.get_traced_memory()[0]
+                    latencies, errors, elapsed = await _drive(client, make_request, requests, concurrency)
+                    summary = _latency_summary(latencies, errors, elapsed)
+                    if trace_memory:
+                        current, peak = tracemalloc.get_traced_memory()
+                        summary["alloc_peak_kb"] = (peak - before) / 1024
+                        summary["alloc_retained_kb"] = (current - before) / 1024
+
+                    key = f"{name} [{symbol_count} symbols]"
+                    results[key] = summary
+                    print(_format_row(key, summary), flush=True)
+    if trace_memory:
+        tracemalloc.stop()
+    return results
+
+def _format_row(key: str, summary: dict):
+    row = (
+        f"{key:<42} {summary['rps']:>9.1f} rps  p50 {summary['p50_ms']:>8.2f} ms  "
+        f"p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  "
+        f"errors {summary['errors']:>4}"
+    )
+    if "alloc_peak_kb" in summary:
+        row += f"  alloc peak {summary['alloc_peak_kb']:>9.1f} KB"
+    return row
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """
+    Print per-route changes between two result files.
+
+    Returns:
+        List of keys whose p95 latency grew or throughput dropped by more than `threshold`
+    """
+    regressions = []
+    for key, new in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        p95_change = (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0
+        rps_change = (new["rps"] - old["rps"]) / old["rps"] if old["rps"] else 0
+        regressed = p95_change > threshold or rps_change < -threshold
+        if regressed:
+            regressions.append(key)
+        print(
+            f"{key:<42} p95 {old['p95_ms']:>8.2f} -> {new['p95_ms']:>8.2f} ms ({p95_change:+.1%})  "
+            f"rps {old['rps']:>8.1f} -> {new['rps']:>8.1f} ({rps_change:+.1%})"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadgen")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Benchmark the main routes")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(SCENARIO_SIZES), help="Tracked symbols per user, one scenario each")
+    run.add_argument("--requests", type=int, default=200, help="Measured requests per route and scenario")
+    run.add_argument("--concurrency", type=int, default=10, help="Concurrent in-flight requests")
+    run.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per route before measuring")
+    run.add_argument("--latency", type=float, default=0.0, help="Synthetic market data latency in seconds")
+    run.add_argument("--jitter", type=float, default=0.0, help="Extra random market data latency in seconds")
+    run.add_argument("--trace-memory", action="store_true", help="Report peak and retained Python allocations per route (slower)")
+    run.add_argument("--workdir", help="Directory for the SQLite database and replay data (default: a temp dir)")
+    run.add_argument("--output", help="Write results as JSON, for later comparison")
+
+    cmp = commands.add_parser("compare", help="Compare two result files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="Allowed relative p95 or rps change (default: 0.10)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+            return 1
+        return 0
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="stock-bench-")
+    configure_environment(workdir, args.latency, args.jitter)
+    results = asyncio.run(run_benchmarks(args.sizes, args.requests, args.concurrency, args.warmup, args.trace_memory))
+
+    if args.output:
+        report = {
+            "meta": {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "latency": args.latency,
+                "jitter": args.jitter
+            },
+            "results": results
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,9 @@
-from fastapi import FastAPI, Request, Form, Depends, HTTPException
+from fastapi import FastAPI, Request, Form, File, UploadFile, Depends, HTTPException, Query
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
-import yfinance as yf
-from datetime import datetime, timedelta
-import logging, uuid, secrets, os, smtplib, hashlib, hmac
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, PlainTextResponse
+from datetime import datetime
+import asyncio, logging, uuid, secrets, os, hmac, time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
@@ -25,31 +25,64 @@ from sqlalchemy.orm import Session
 # Load environment variables
 load_dotenv()
 
-from app.db import create_db_and_tables, get_async_session, Stock, User, PasswordReset
-from app.auth import fastapi_users, auth_backend, current_active_user, get_user_manager
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(), logging.FileHandler("stocks.log")]
+from app.logs import setup_logging, access_logger, log_stats
+from app.db import engine, create_db_and_tables, get_async_session, Stock, User, PasswordReset
+from app.history import get_price_history, get_history_version
+from app.indicators import compute_indicators
+from app.watchlist import (
+    WATCHLIST_BULK_MAX_SYMBOLS, WATCHLIST_IMPORT_MAX_BYTES, WatchlistChanges, watchlist_cache, get_user_symbols,
+    SYMBOL_PATTERN, invalidate_user_symbols, normalize_symbols, parse_symbol_text, parse_symbol_csv, apply_watchlist_changes, stream_user_symbols
+)
+from app.auth import fastapi_users, auth_backend, current_active_user, optional_page_user, get_user_manager, user_cache
+from app.executor import get_executor_stats, shutdown_executor
+from app.singleflight import upstream_flight, run_upstream
+from app.providers import market_data
+from app.actions import ClientActionEvent, ClientActionBatch, action_buffer, start_action_flusher
+from app.mailer import EMAIL_FROM, mail_queue
+from app.shared_quotes import shared_quotes, start_shared_quote_refresher
+from app.sessions import ADMIN_SESSION_TTL, admin_sessions, start_session_sweeper
+from app.admin import get_dashboard_summary, list_users, list_stocks, list_password_resets
+from app.metrics import (
+    registry, REQUEST_DURATION, STAGE_DURATION, TEMPLATE_RENDER_DURATION, instrument_engine, instrument_templates,
+    register_cache_stats, register_stats_gauges, start_event_loop_monitor
 )
+from app.viewmodels import format_monetary_value
+from app.fragments import fragment_cache
+from app.http_cache import make_etag, http_date, is_not_modified, not_modified
+from app.quotes import quote_snapshot, quote_cache, quote_ranking, upstream_stats, get_quotes, get_ranked_quotes, subscribe_quotes, unsubscribe_quotes
+
+# Configure logging: records are queued and written to stderr and stocks.log by a background thread
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Environment variables
-EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
-EMAIL_USER = os.getenv("EMAIL_USER", "")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
-EMAIL_FROM = os.getenv("EMAIL_FROM", "noreply@stockmarket.com")
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "changeme")
+CHART_CACHE_MAX_AGE = int(os.getenv("CHART_CACHE_MAX_AGE", "60"))
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
+GZIP_COMPRESS_LEVEL = int(os.getenv("GZIP_COMPRESS_LEVEL", "6"))
 
 app = FastAPI()
-templates = Jinja2Templates(directory="templates")
+templates = instrument_templates(Jinja2Templates(directory="templates"))
+market_tables_template = templates.get_template("_market_tables.html")
 security = HTTPBasic()
 
+# Compress HTML and JSON responses (Server-Sent Events are left uncompressed by the middleware)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
+
+# Metrics exported on /metrics
+instrument_engine(engine)
+register_cache_stats("quote", quote_cache.stats)
+register_cache_stats("watchlist", watchlist_cache.stats)
+register_cache_stats("fragment", fragment_cache.stats)
+register_cache_stats("user", user_cache.stats)
+register_stats_gauges("quote_cache", "Quote cache counters and settings", quote_cache.stats)
+register_stats_gauges("quote_upstream", "Quote fetches made against the market data provider", lambda: upstream_stats)
+register_stats_gauges("upstream_executor", "Upstream thread pool saturation and queue wait", get_executor_stats)
+register_stats_gauges("upstream_singleflight", "Upstream calls made and coalesced by the single-flight layer", upstream_flight.stats)
+register_stats_gauges("mail_queue", "Outbound email queue depth, sends, retries and SMTP connections", mail_queue.stats)
+
 # User schemas
 class UserRead(schemas.BaseUser[uuid.UUID]): pass
 class UserCreate(schemas.BaseUserCreate): pass
@@ -74,156 +107,117 @@ TICKERS = [
   "WMT", "COST", "V", "MA", "PYPL", "COIN"
 ]
 
+# Quote fields returned by the JSON API, and the ones it can sort by
+QUOTE_API_FIELDS = (
+    "symbol", "name", "price", "change", "percent_change", "volume", "market_cap",
+    "fifty_two_week_low", "fifty_two_week_high", "prev_close", "low", "high", "stale"
+)
+QUOTE_SORT_FIELDS = {"symbol", "name", "price", "change", "percent_change", "volume", "market_cap"}
+QUOTE_API_MAX_SYMBOLS = 100
+QUOTE_STREAM_HEARTBEAT = 15
+
 # Add a request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = datetime.now()
-    
-    # Get client info
-    client_host = request.client.host if request.client else "unknown"
-    user_agent = request.headers.get("user-agent", "unknown")
-    referer = request.headers.get("referer", "direct")
-    
-    # Log request details
-    logger.info(f"Request started: {request.method} {request.url.path} from {client_host} - Referer: {referer}")
+    start_time = time.perf_counter()
     
     # Process the request
     response = await call_next(request)
     
-    # Calculate duration
-    duration = (datetime.now() - start_time).total_seconds()
+    # Calculate duration, labelled by route template so /chart/{symbol} is one series
+    duration = time.perf_counter() - start_time
+    route = request.scope.get("route")
+    REQUEST_DURATION.observe(
+        duration, method=request.method, route=route.path if route else "unmatched", status=response.status_code
+    )
     
-    # Log response details including status code
-    logger.info(f"Request completed: {request.method} {request.url.path} - Status: {response.status_code} - Duration: {duration:.4f}s")
+    # One sampled access record per request; formatted on the logging thread
+    access_logger.info(
+        "%s %s - Status: %s - Duration: %.4fs", request.method, request.url.path, response.status_code, duration,
+        extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "duration": duration,
+            "client": request.client.host if request.client else "unknown",
+            "referer": request.headers.get("referer", "direct")
+        }
+    )
     
     return response
 
 # Function to log user interactions
 def log_user_interaction(action_type, action_details, user=None):
     user_id = str(user.id) if user else "anonymous"
-    logger.info(f"User Interaction: {action_type} - User: {user_id} - Details: {action_details}")
-
-# Function to format monetary values
-def format_monetary_value(value, include_dollar_sign=True):
-    """
-    Format monetary values or volume values to use M for millions and B for billions with 2 decimal places.
-    
-    Args:
-        value: The numeric value to format
-        include_dollar_sign: Whether to include a dollar sign (for monetary values)
-        
-    Returns:
-        Formatted string with M for millions, B for billions, limited to 2 decimal places
-    """
-    if value is None or value == "N/A":
-        return "N/A"
-    
-    try:
-        # Convert to float if it's not already
-        value = float(value)
-        
-        # Format based on magnitude
-        prefix = "$" if include_dollar_sign else ""
-        if value >= 1_000_000_000:  # Billions
-            return f"{prefix}{value / 1_000_000_000:.2f}B"
-        elif value >= 1_000_000:  # Millions
-            return f"{prefix}{value / 1_000_000:.2f}M"
-        else:
-            return f"{prefix}{value:.2f}"
-    except (ValueError, TypeError):
-        return str(value)
+    logger.info("User Interaction: %s - User: %s - Details: %s", action_type, user_id, action_details)
 
 @app.get("/", response_class=HTMLResponse)
 async def get_stock_data(
     request: Request,
-    user = Depends(fastapi_users.current_user(optional=True)),
+    user = Depends(optional_page_user),
     session: AsyncSession = Depends(get_async_session)
 ):
     # Get user's custom symbols if logged in
     user_symbols = []
     if user:
-        result = await session.execute(select(Stock.symbol).where(Stock.user_id == user.id))
-        user_symbols = [row[0] for row in result.all()]
+        with STAGE_DURATION.time(handler="index", stage="watchlist"):
+            user_symbols = await get_user_symbols(session, user.id)
     
     # Combine predefined and user symbols
     all_symbols = list(set(TICKERS + user_symbols))
     
-    # Fetch stock data
-    results = []
-    for symbol in all_symbols:
-        try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            
-            if not info or "regularMarketPrice" not in info:
-                continue
-                
-            results.append({
-                "symbol": symbol,
-                "name": info.get("shortName") or info.get("longName") or symbol,
-                "price": info.get("regularMarketPrice"),
-                "change": info.get("regularMarketChange", 0),
-                "percent_change": info.get("regularMarketChangePercent", 0),
-                "volume": info.get("regularMarketVolume"),
-                "market_cap": info.get("marketCap"),
-                "fifty_two_week_low": info.get("fiftyTwoWeekLow"),
-                "fifty_two_week_high": info.get("fiftyTwoWeekHigh"),
-                "prev_close": info.get("regularMarketPreviousClose", 0),
-                "low": info.get("regularMarketDayLow", 0),
-                "high": info.get("regularMarketDayHigh", 0)
-            })
-        except IndexError as e:
-            logger.error(f"Index error processing {symbol}: {str(e)}")
-            results.append({
-                "symbol": symbol,
-                "name": symbol,
-                "price": 0,
-                "change": 0,
-                "percent_change": 0,
-                "volume": 0,
-                "market_cap": 0,
-                "fifty_two_week_low": 0,
-                "fifty_two_week_high": 0,
-                "prev_close": 0,
-                "low": 0,
-                "high": 0
-            })
-        except Exception as e:
-            logger.error(f"Error processing {symbol}: {str(e)}")
-    
-    # Sort and separate gainers and losers
-    results.sort(key=lambda x: x["percent_change"], reverse=True)
-    gainers = [stock for stock in results if stock["percent_change"] >= 0]
-    losers = [stock for stock in results if stock["percent_change"] < 0]
-    
-    # Filter out user's stocks for portfolio section
+    # Read stock data from the shared quote cache, already ranked into gainers and losers
+    with STAGE_DURATION.time(handler="index", stage="quotes"):
+        gainers, losers, unavailable_symbols, upstream_calls = await get_ranked_quotes(all_symbols)
+    logger.debug("Index render for %d symbols cost %d upstream calls", len(all_symbols), upstream_calls)
+    if unavailable_symbols:
+        logger.warning("Quotes unavailable for %d symbols", len(unavailable_symbols), extra={"symbols": sorted(unavailable_symbols)})
+    
+    # The page is fully determined by the quote snapshot and the user's watchlist
+    snapshot_version = quote_snapshot["version"]
+    last_modified = quote_snapshot["updated_at"]
+    gainer_symbols = tuple(stock.symbol for stock in gainers)
+    loser_symbols = tuple(stock.symbol for stock in losers)
+    stale_symbols = tuple(stock.symbol for stock in gainers + losers if stock.stale)
+    tracked_symbols = tuple(sorted(set(user_symbols))) if user else None
+    fragment_key = (snapshot_version, gainer_symbols, loser_symbols, stale_symbols, tracked_symbols)
+    etag = make_etag(fragment_key, sorted(unavailable_symbols), str(user.id) if user else None, user.email if user else None)
+    
+    # Anonymous pages are identical for everyone, so they can also be validated by date
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not user:
+        cache_headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request, etag, None if user else last_modified):
+        return not_modified(cache_headers)
+    
+    last_update = last_modified.strftime("%Y-%m-%d %H:%M:%S")
+    
+    # Shared gainers/losers tables, rendered once per snapshot and watchlist
+    def render_market_tables():
+        with TEMPLATE_RENDER_DURATION.time(template="_market_tables.html"):
+            return market_tables_template.render(
+                user=bool(user), user_symbols=user_symbols, gainers=gainers, losers=losers, last_update=last_update
+            )
+    market_tables = fragment_cache.get_or_render(fragment_key, render_market_tables)
+    
+    # Filter out user's stocks for portfolio section; quotes arrive already formatted
     user_stock_data = []
     if user and user_symbols:
-        user_stock_data = [stock for stock in results if stock["symbol"] in user_symbols]
-    
-    # Format monetary values
-    for stock_list in [gainers, losers, user_stock_data]:
-        for stock in stock_list:
-            stock["formatted_price"] = format_monetary_value(stock["price"])
-            stock["formatted_market_cap"] = format_monetary_value(stock["market_cap"])
-            stock["formatted_volume"] = format_monetary_value(stock["volume"], False)
-            stock["formatted_52_week_low"] = format_monetary_value(stock["fifty_two_week_low"])
-            stock["formatted_52_week_high"] = format_monetary_value(stock["fifty_two_week_high"])
-            stock["formatted_prev_close"] = format_monetary_value(stock["prev_close"])
-            stock["formatted_low"] = format_monetary_value(stock["low"])
-            stock["formatted_high"] = format_monetary_value(stock["high"])
+        user_stock_data = [stock for stock in gainers + losers if stock.symbol in user_symbols]
     
+    # Template render time is recorded per template by instrument_templates
     return templates.TemplateResponse(
         "index.html",
         {
             "request": request,
             "user": user,
-            "gainers": gainers, 
-            "losers": losers,
+            "market_tables": market_tables,
             "user_symbols": user_symbols,
             "user_stock_data": user_stock_data,
-            "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+            "unavailable_symbols": sorted(unavailable_symbols),
+            "last_update": last_update
+        },
+        headers=cache_headers
     )
 
 @app.get("/login")
@@ -243,7 +237,7 @@ async def logout(request: Request):
     return RedirectResponse("/", status_code=303)
 
 @app.get("/about", response_class=HTMLResponse)
-async def about(request: Request, user = Depends(fastapi_users.current_user(optional=True))):
+async def about(request: Request, user = Depends(optional_page_user)):
     """About page with information about the application."""
     return templates.TemplateResponse("about.html", {"request": request, "user": user})
 
@@ -278,12 +272,9 @@ async def add_stock(
     if not symbol:
         return RedirectResponse("/", status_code=400)
     
-    result = await session.execute(
-        select(Stock).where(Stock.user_id == user.id, Stock.symbol == symbol)
-    )
-    if not result.scalars().first():
-        session.add(Stock(user_id=user.id, symbol=symbol))
-        await session.commit()
+    # Skips a symbol that is already tracked, even when two adds race
+    added, _ = await apply_watchlist_changes(session, user.id, add=[symbol])
+    if added:
         # Log stock addition
         log_user_interaction("add_stock", f"Symbol: {symbol}", user)
     
@@ -303,11 +294,77 @@ async def remove_stock(
     if stock:
         await session.delete(stock)
         await session.commit()
+        invalidate_user_symbols(user.id)
         # Log stock removal
         log_user_interaction("remove_stock", f"Symbol: {symbol}", user)
     
     return RedirectResponse("/", status_code=303)
 
+def check_replacement(to_add, invalid):
+    """A replace drops everything not imported, so refuse one that is empty or had entries rejected."""
+    if not to_add or invalid:
+        raise HTTPException(status_code=400, detail={
+            "message": "Replace needs at least one symbol and no rejected entries; nothing was changed",
+            "invalid": invalid
+        })
+
+@app.post("/import-stocks")
+async def import_stocks(
+    symbols: str = Form(""),
+    file: Optional[UploadFile] = File(None),
+    replace: bool = Form(False),
+    user = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Track every symbol in a pasted list and/or an uploaded CSV file, in one transaction."""
+    to_add, invalid = parse_symbol_text(symbols)
+    if file is not None and file.filename:
+        data = await file.read(WATCHLIST_IMPORT_MAX_BYTES + 1)
+        if len(data) > WATCHLIST_IMPORT_MAX_BYTES:
+            raise HTTPException(status_code=400, detail=f"Import files are limited to {WATCHLIST_IMPORT_MAX_BYTES} bytes")
+        from_file, invalid_in_file = parse_symbol_csv(data)
+        to_add = list(dict.fromkeys(to_add + from_file))
+        invalid += invalid_in_file
+    if len(to_add) > WATCHLIST_BULK_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {WATCHLIST_BULK_MAX_SYMBOLS} symbols per import")
+    if replace:
+        check_replacement(to_add, invalid)
+    if not to_add:
+        return RedirectResponse("/", status_code=303)
+    
+    added, removed = await apply_watchlist_changes(session, user.id, add=to_add, replace=replace)
+    log_user_interaction("import_stocks", f"Added: {added}, Removed: {removed}, Invalid: {len(invalid)}", user)
+    
+    return RedirectResponse("/", status_code=303)
+
+@app.post("/api/watchlist")
+async def api_update_watchlist(
+    changes: WatchlistChanges,
+    user = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Add and remove many symbols at once; returns what changed and which symbols were rejected."""
+    to_add, invalid = normalize_symbols(changes.add)
+    to_remove, invalid_removals = normalize_symbols(changes.remove)
+    if changes.replace:
+        check_replacement(to_add, invalid)
+    added, removed = await apply_watchlist_changes(session, user.id, add=to_add, remove=to_remove, replace=changes.replace)
+    log_user_interaction("update_watchlist", f"Added: {added}, Removed: {removed}", user)
+    return {"added": added, "removed": removed, "invalid": invalid + invalid_removals}
+
+@app.get("/export-stocks")
+async def export_stocks(
+    format: str = Query("csv", pattern="^(csv|json)$"),
+    user = Depends(current_active_user)
+):
+    """Stream the user's tracked symbols as a CSV or JSON download."""
+    media_type = "text/csv" if format == "csv" else "application/json"
+    return StreamingResponse(
+        stream_user_symbols(user.id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="watchlist.{format}"'}
+    )
+
 @app.get("/forgot-password", response_class=HTMLResponse)
 async def forgot_password(request: Request):
     return templates.TemplateResponse("forgot_password.html", {"request": request})
@@ -463,39 +520,44 @@ async def reset_password_post(
 @app.on_event("startup")
 async def on_startup():
     await create_db_and_tables()
+    # Start the background quote refresher so page views only read from memory
+    app.state.quote_refresher = start_shared_quote_refresher(TICKERS)
+    app.state.event_loop_monitor = start_event_loop_monitor()
+    app.state.action_flusher = start_action_flusher()
+    app.state.mail_worker = mail_queue.start()
+    app.state.session_sweeper = start_session_sweeper()
     logger.info("Application starting up")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for task_name in ("quote_refresher", "event_loop_monitor", "session_sweeper"):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+    # Let the action flusher write out whatever is still buffered
+    action_flusher = getattr(app.state, "action_flusher", None)
+    if action_flusher:
+        action_flusher.cancel()
+        await asyncio.gather(action_flusher, return_exceptions=True)
+    # Give queued emails a chance to go out before the upstream pool goes away
+    await mail_queue.stop()
+    shutdown_executor()
     logger.info("Application shutting down")
 
 # Function to send emails
 async def send_email(to_email: str, subject: str, html_content: str) -> bool:
-    # Check if email credentials are available
-    if not EMAIL_USER or not EMAIL_PASSWORD:
-        logger.info(f"Email credentials not configured. Would send email to {to_email}")
-        logger.info(f"Email content: {html_content}")
-        return False
-    
-    try:
-        # Create message
-        message = MIMEMultipart("alternative")
-        message["Subject"] = subject
-        message["From"] = EMAIL_FROM
-        message["To"] = to_email
-        message.attach(MIMEText(html_content, "html"))
-        
-        # Send email
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_FROM, to_email, message.as_string())
-        
-        logger.info(f"Email sent to {to_email}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send email: {str(e)}")
-        return False
+    """
+    Queue an email for the background mail worker and return immediately.
+
+    Returns:
+        True if the email was queued, False if the mail queue is full
+    """
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = EMAIL_FROM
+    message["To"] = to_email
+    message.attach(MIMEText(html_content, "html"))
+    return mail_queue.enqueue(to_email, message.as_string())
 
 # Admin routes
 @app.get("/admin", response_class=HTMLResponse)
@@ -513,19 +575,16 @@ async def admin_login(
     
     if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
         response = RedirectResponse(url="/admin/dashboard", status_code=303)
-        token = hashlib.sha256(f"{username}:{password}:{os.urandom(8).hex()}".encode()).hexdigest()
+        token = await admin_sessions.create()
         
         response.set_cookie(
             key="admin_session",
             value=token,
             httponly=True,
-            max_age=3600,
+            max_age=ADMIN_SESSION_TTL,
             path="/admin"
         )
         
-        app.state.admin_sessions = getattr(app.state, "admin_sessions", set())
-        app.state.admin_sessions.add(token)
-        
         return response
     else:
         return templates.TemplateResponse(
@@ -536,9 +595,8 @@ async def admin_login(
 
 async def verify_admin(request: Request):
     admin_token = request.cookies.get("admin_session")
-    admin_sessions = getattr(app.state, "admin_sessions", set())
     
-    if not admin_token or admin_token not in admin_sessions:
+    if not admin_token or not await admin_sessions.is_valid(admin_token):
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Not authenticated",
@@ -549,67 +607,40 @@ async def verify_admin(request: Request):
 @app.get("/admin/dashboard", response_class=HTMLResponse)
 async def admin_dashboard(
     request: Request,
+    tab: str = Query("users", pattern="^(users|stocks|resets)$"),
+    users_q: str = Query("", max_length=100),
+    users_after: str = Query("", max_length=500),
+    stocks_q: str = Query("", max_length=100),
+    stocks_after: str = Query("", max_length=500),
+    resets_q: str = Query("", max_length=100),
+    resets_status: str = Query("all", pattern="^(all|active|expired)$"),
+    resets_after: str = Query("", max_length=500),
     session: AsyncSession = Depends(get_async_session),
     _: bool = Depends(verify_admin)
 ):
     # Log admin dashboard access
     logger.info("Admin accessed dashboard")
     
-    # Query all users
-    users_query = await session.execute(select(User))
-    users = users_query.scalars().all()
-    
-    # Create raw user data for debugging
-    raw_users = [
-        {
-            "id": str(user.id),
-            "email": user.email,
-            "is_active": user.is_active,
-            "is_superuser": user.is_superuser,
-            "is_verified": user.is_verified,
-            "hashed_password": user.hashed_password,
-        } for user in users
-    ]
-    
-    # Query all stocks with user emails
-    stocks_query = await session.execute(
-        select(Stock, User.email).join(User, Stock.user_id == User.id)
-    )
-    stocks = [
-        {
-            "id": stock.id,
-            "user_id": stock.user_id,
-            "user_email": user_email,
-            "symbol": stock.symbol
-        } for stock, user_email in stocks_query.all()
-    ]
-    
-    # Query all password resets with user emails
-    resets_query = await session.execute(
-        select(PasswordReset, User.email).join(User, PasswordReset.user_id == User.id)
-    )
-    
-    password_resets = []
-    for reset, user_email in resets_query.all():
-        expiry_time = reset.created_at + timedelta(hours=24)
-        password_resets.append({
-            "id": reset.id,
-            "user_id": reset.user_id,
-            "user_email": user_email,
-            "token": reset.token,
-            "created_at": reset.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            "expires_at": expiry_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "is_expired": datetime.now() > expiry_time
-        })
+    # Each table is paginated independently with keyset cursors; the summary comes from aggregates
+    summary = await get_dashboard_summary(session)
+    users = await list_users(session, users_q, users_after)
+    stocks = await list_stocks(session, stocks_q, stocks_after)
+    password_resets = await list_password_resets(session, resets_q, resets_status, resets_after)
     
     return templates.TemplateResponse(
         "admin_dashboard.html",
         {
             "request": request,
+            "tab": tab,
+            "summary": summary,
             "users": users,
-            "raw_users": raw_users,
             "stocks": stocks,
-            "password_resets": password_resets
+            "resets": password_resets,
+            "users_q": users_q,
+            "stocks_q": stocks_q,
+            "resets_q": resets_q,
+            "resets_status": resets_status,
+            "current_year": datetime.now().year
         }
     )
 
@@ -618,13 +649,23 @@ async def admin_logout(request: Request):
     # Log admin logout
     logger.info("Admin logged out")
     
+    admin_token = request.cookies.get("admin_session")
+    if admin_token:
+        await admin_sessions.delete(admin_token)
+    
     response = RedirectResponse(url="/admin", status_code=303)
     response.delete_cookie(key="admin_session", path="/admin")
     
     return response
 
 @app.get("/chart/{symbol}", response_class=HTMLResponse)
-async def get_stock_chart(request: Request, symbol: str, period: str = "1y", user = Depends(fastapi_users.current_user(optional=True))):
+async def get_stock_chart(
+    request: Request,
+    symbol: str,
+    period: str = "1y",
+    user = Depends(optional_page_user),
+    session: AsyncSession = Depends(get_async_session)
+):
     """Display detailed stock information for the given stock symbol."""
     # Log stock details access
     log_user_interaction("view_stock_details", f"Symbol: {symbol}, Period: {period}", user)
@@ -634,9 +675,22 @@ async def get_stock_chart(request: Request, symbol: str, period: str = "1y", use
         if period not in valid_periods:
             period = "1y"  # Default to 1 year if invalid period
         
-        # Fetch historical stock data
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period=period)
+        # Daily bars barely change intraday: answer repeat views from the stored
+        # coverage record alone when the client already has this version
+        def chart_etag(version):
+            return make_etag(version, symbol, str(user.id) if user else None, user.email if user else None)
+        
+        version = await get_history_version(session, symbol, period)
+        cache_headers = {
+            "Cache-Control": f"{'private' if user else 'public'}, max-age={CHART_CACHE_MAX_AGE}",
+            "Vary": "Cookie"
+        }
+        if version is not None and is_not_modified(request, chart_etag(version)):
+            return not_modified({**cache_headers, "ETag": chart_etag(version)})
+        
+        # Read historical stock data from the local price store
+        with STAGE_DURATION.time(handler="chart", stage="history"):
+            hist = await get_price_history(session, symbol, period)
         
         if hist.empty:
             # No data available for this symbol
@@ -646,45 +700,44 @@ async def get_stock_chart(request: Request, symbol: str, period: str = "1y", use
             )
         
         # Get company name if available
-        company_name = ticker.info.get('shortName', symbol) if hasattr(ticker, 'info') else symbol
+        with STAGE_DURATION.time(handler="chart", stage="info"):
+            try:
+                info = await run_upstream(("info", symbol.upper()), market_data.get_info, symbol)
+            except Exception as e:
+                logger.error("Error fetching info for %s: %s", symbol, e)
+                info = None
+        company_name = info.get('shortName', symbol) if info else symbol
         
-        # Calculate some basic statistics
-        if not hist.empty:
-            current_price = hist['Close'].iloc[-1]
-            prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
-            change = current_price - prev_close
-            percent_change = (change / prev_close) * 100 if prev_close != 0 else 0
-            
-            # Get min and max prices for the period
-            period_high = hist['High'].max()
-            period_low = hist['Low'].min()
-            
-            # Get the latest volume
-            latest_volume = hist['Volume'].iloc[-1]
-            avg_volume = hist['Volume'].mean()
-            
-            # Calculate moving averages
-            if len(hist) >= 50:
-                ma50 = hist['Close'].rolling(window=50).mean().iloc[-1]
-            else:
-                ma50 = None
-                
-            if len(hist) >= 200:
-                ma200 = hist['Close'].rolling(window=200).mean().iloc[-1]
-            else:
-                ma200 = None
+        # Version of the bars just loaded (None only if storing the download failed)
+        version = await get_history_version(session, symbol, period)
+        if version is not None:
+            cache_headers["ETag"] = chart_etag(version)
         else:
-            current_price = prev_close = change = percent_change = period_high = period_low = latest_volume = avg_volume = ma50 = ma200 = None
+            cache_headers = {"Cache-Control": "no-cache"}
+        
+        # Calculate price statistics and indicators in one vectorized pass
+        with STAGE_DURATION.time(handler="chart", stage="indicators"):
+            indicators = compute_indicators(symbol, period, hist)
+        current_price = indicators["current_price"]
+        prev_close = indicators["prev_close"]
+        change = indicators["change"]
+        percent_change = indicators["percent_change"]
+        period_high = indicators["period_high"]
+        period_low = indicators["period_low"]
+        latest_volume = indicators["latest_volume"]
+        avg_volume = indicators["avg_volume"]
+        ma50 = indicators["sma"].get(50)
+        ma200 = indicators["sma"].get(200)
         
         # Get additional stock information for the template
         try:
             stock_info = {
-                "market_cap": ticker.info.get("marketCap", "N/A"),
-                "pe_ratio": ticker.info.get("trailingPE", "N/A"),
-                "dividend_yield": ticker.info.get("dividendYield", "N/A"),
-                "avg_volume": ticker.info.get("averageVolume", "N/A"),
-                "fifty_two_week_high": ticker.info.get("fiftyTwoWeekHigh", "N/A"),
-                "fifty_two_week_low": ticker.info.get("fiftyTwoWeekLow", "N/A"),
+                "market_cap": info.get("marketCap", "N/A"),
+                "pe_ratio": info.get("trailingPE", "N/A"),
+                "dividend_yield": info.get("dividendYield", "N/A"),
+                "avg_volume": info.get("averageVolume", "N/A"),
+                "fifty_two_week_high": info.get("fiftyTwoWeekHigh", "N/A"),
+                "fifty_two_week_low": info.get("fiftyTwoWeekLow", "N/A"),
                 "current_price": current_price,
                 "prev_close": prev_close,
                 "change": change,
@@ -750,12 +803,14 @@ async def get_stock_chart(request: Request, symbol: str, period: str = "1y", use
                 "user": user,
                 "current_year": datetime.now().year,
                 "current_period": period,
-                "stock_info": stock_info
-            }
+                "stock_info": stock_info,
+                "indicators": indicators
+            },
+            headers=cache_headers
         )
     except Exception as e:
         # Log the error
-        logging.error(f"Error retrieving stock details for {symbol}: {str(e)}")
+        logger.error("Error retrieving stock details for %s: %s", symbol, e)
         
         # Return error template
         return templates.TemplateResponse(
@@ -763,18 +818,173 @@ async def get_stock_chart(request: Request, symbol: str, period: str = "1y", use
             {"request": request, "error": f"Error retrieving stock details: {str(e)}", "user": user, "current_year": datetime.now().year}
         )
 
+@app.get("/api/quotes")
+async def api_quotes(
+    symbols: Optional[str] = None,
+    sort: str = "-percent_change",
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    user = Depends(optional_page_user)
+):
+    """
+    Quotes as compact JSON, served from the quote cache.
+
+    `symbols` is a comma-separated filter (defaults to the predefined tickers), `sort`
+    is a field name with an optional leading "-" for descending order, and
+    `format=ndjson` streams one quote per line. Anonymous callers only get symbols
+    that are already cached; others are reported as unavailable, not fetched.
+    """
+    if symbols:
+        requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+        if len(requested) > QUOTE_API_MAX_SYMBOLS:
+            raise HTTPException(status_code=400, detail=f"At most {QUOTE_API_MAX_SYMBOLS} symbols per request")
+        invalid = [symbol for symbol in requested if not SYMBOL_PATTERN.match(symbol)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid symbols: {', '.join(invalid[:10])}")
+    else:
+        requested = TICKERS
+
+    sort_field = sort.lstrip("-")
+    if sort_field not in QUOTE_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort_field}")
+
+    if sort_field == "percent_change":
+        # Already ordered by the incremental ranking index
+        gainers, losers, unavailable_symbols, _ = await get_ranked_quotes(requested, fetch_missing=user is not None)
+        ordered = gainers + losers
+        if not sort.startswith("-"):
+            ordered.reverse()
+    else:
+        # Sort, keeping quotes without a value for the field at the end
+        results, unavailable_symbols, _ = await get_quotes(requested, fetch_missing=user is not None)
+        ordered = [quote for quote in results if getattr(quote, sort_field) is not None]
+        ordered.sort(key=lambda quote: getattr(quote, sort_field), reverse=sort.startswith("-"))
+        ordered += [quote for quote in results if getattr(quote, sort_field) is None]
+    page = [quote.to_dict(QUOTE_API_FIELDS) for quote in ordered[offset:offset + limit]]
+    
+    if format == "ndjson":
+        def stream_quotes():
+            for quote in page:
+                yield json.dumps(quote, separators=(",", ":")) + "\n"
+            for symbol in sorted(unavailable_symbols):
+                yield json.dumps({"symbol": symbol, "unavailable": True}, separators=(",", ":")) + "\n"
+        return StreamingResponse(stream_quotes(), media_type="application/x-ndjson")
+    
+    return {
+        "total": len(ordered),
+        "offset": offset,
+        "limit": limit,
+        "quotes": page,
+        "unavailable": sorted(unavailable_symbols)
+    }
+
+async def visible_symbols(session: AsyncSession, user):
+    """Symbols a caller may see in market-wide views: the predefined tickers plus their own watchlist."""
+    if user is None:
+        return set(TICKERS)
+    return set(TICKERS).union(await get_user_symbols(session, user.id))
+
+@app.get("/api/movers")
+async def api_movers(
+    k: int = Query(10, ge=1, le=100),
+    user = Depends(optional_page_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Top-K gainers and losers among the predefined tickers and the caller's own
+    watchlist, read off the ranking index.
+    """
+    symbols = await visible_symbols(session, user)
+    
+    def to_json(symbol):
+        return quote_cache.peek(symbol).to_dict(field for field in QUOTE_API_FIELDS if field != "stale")
+    
+    return {
+        "gainers": [to_json(symbol) for symbol in quote_ranking.gainers(k, symbols=symbols)],
+        "losers": [to_json(symbol) for symbol in quote_ranking.losers(k, symbols=symbols)]
+    }
+
+@app.get("/api/quotes/stream")
+async def stream_quote_updates(
+    request: Request,
+    symbols: Optional[str] = None,
+    user = Depends(optional_page_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Server-Sent Events stream of changed quotes.
+
+    Each refresh of the shared quote refresher publishes only the symbols whose
+    values changed, as a "quotes" event: {"updated": ..., "quotes": {symbol: {...}}}.
+    Updates are limited to the predefined tickers and the caller's own watchlist,
+    so other users' symbols never show up.
+    """
+    wanted = await visible_symbols(session, user)
+    if symbols:
+        wanted &= {s.strip().upper() for s in symbols.split(",") if s.strip()}
+    
+    async def event_stream():
+        queue = subscribe_quotes()
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=QUOTE_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                
+                changes = {symbol: quote for symbol, quote in update["quotes"].items() if symbol in wanted}
+                if changes:
+                    payload = json.dumps({"updated": update["updated"], "quotes": changes}, separators=(",", ":"))
+                    yield f"event: quotes\ndata: {payload}\n\n"
+        finally:
+            unsubscribe_quotes(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/stats")
+async def get_stats():
+    """Runtime counters for the quote cache, upstream fetches and the upstream thread pool."""
+    return {
+        "quote_cache": quote_cache.stats(),
+        "quote_upstream": upstream_stats,
+        "upstream_executor": get_executor_stats(),
+        "watchlist_cache": watchlist_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "upstream_singleflight": upstream_flight.stats(),
+        "logging": log_stats,
+        "client_actions": action_buffer.stats(),
+        "fragment_cache": fragment_cache.stats(),
+        "quote_snapshot": quote_snapshot,
+        "mail_queue": mail_queue.stats(),
+        "admin_sessions": admin_sessions.stats(),
+        "shared_quotes": shared_quotes.stats() if shared_quotes else None
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms and cache counters in the Prometheus text exposition format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/log-actions")
+async def log_client_actions(events: ClientActionBatch):
+    """Batch endpoint for client-side analytics events; accepts a JSON array of events."""
+    action_buffer.add(events)
+    return {"status": "success", "accepted": len(events)}
+
 @app.post("/log-action")
 async def log_client_action(request: Request):
-    """Endpoint to handle client-side logging from JavaScript."""
+    """Single-event endpoint kept for older pages; prefer /log-actions."""
     try:
-        log_data = await request.json()
-        action = log_data.get("action", "unknown")
-        details = log_data.get("details", "none")
-        page = log_data.get("page", "unknown")
-        timestamp = log_data.get("timestamp", datetime.now().isoformat())
-        
-        logger.info(f"Client Action: {action} - Page: {page} - Details: {details} - Time: {timestamp}")
+        event = ClientActionEvent(**await request.json())
+        action_buffer.add([event])
         return {"status": "success"}
     except Exception as e:
-        logger.error(f"Error logging client action: {str(e)}")
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        logger.error("Error logging client action: %s", e)
+        return {"status": "error", "message": str(e)}
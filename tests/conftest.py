@@ -0,0 +1,26 @@
+import tempfile
+import pytest
+
+from .fixtures import configure_environment, create_user, watchlist_symbols
+
+# Configure the app (throwaway SQLite database, replay market data) before the tests import it
+configure_environment(tempfile.mkdtemp(prefix="stock-tests-"))
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def run(client):
+    """Run a coroutine function on the app's event loop, where its database engine and locks live."""
+    return client.portal.call
+
+@pytest.fixture
+def user_cookie(client):
+    """Auth cookie for a new user tracking the ten synthetic symbols W0000..W0009."""
+    _, token = client.portal.call(create_user, watchlist_symbols(10))
+    return {"Cookie": f"auth={token}"}
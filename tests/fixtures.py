@@ -0,0 +1,81 @@
+import os, json, uuid
+import numpy as np
+import pandas as pd
+
+# Test setup. configure_environment must run before `main` or any `app` module is
+# imported, because their configuration is read from the environment at import time.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEST_PASSWORD = "test-password"
+HISTORY_DAYS = 1300  # about five years of daily bars
+
+def watchlist_symbols(count: int):
+    """Synthetic watchlist symbols, e.g. W0000..W0009."""
+    return [f"W{i:04d}" for i in range(count)]
+
+def _random_walk_bars(rng, days: int):
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days, name="Date")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    return pd.DataFrame({
+        "Open": close,
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": rng.integers(100_000, 50_000_000, days)
+    }, index=dates)
+
+def write_replay_data(data_dir: str, symbols, seed: int = 7):
+    """Write a deterministic replay directory (see app.providers.ReplayProvider) with full history for every symbol."""
+    from app.providers import _quote_from_bars
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(data_dir, "history"), exist_ok=True)
+    quotes, info = {}, {}
+    for symbol in symbols:
+        bars = _random_walk_bars(rng, HISTORY_DAYS)
+        name = f"{symbol} Test Corp"
+        quotes[symbol] = _quote_from_bars(symbol, bars.tail(260), {"name": name})
+        info[symbol] = {"shortName": name, "currency": "USD"}
+        bars.to_csv(os.path.join(data_dir, "history", f"{symbol}.csv"))
+
+    with open(os.path.join(data_dir, "quotes.json"), "w") as f:
+        json.dump(quotes, f)
+    with open(os.path.join(data_dir, "info.json"), "w") as f:
+        json.dump(info, f)
+
+def configure_environment(workdir: str):
+    """Point the app at a fresh SQLite database and synthetic replay data in `workdir`."""
+    os.chdir(REPO_ROOT)
+    data_dir = os.path.join(workdir, "replay")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'test.db')}"
+    os.environ["MARKET_DATA_PROVIDER"] = "replay"
+    os.environ["REPLAY_DATA_DIR"] = data_dir
+    os.environ["REPLAY_LATENCY"] = "0"
+    os.environ["REPLAY_LATENCY_JITTER"] = "0"
+
+    from main import TICKERS
+    from app.providers import market_data
+    write_replay_data(data_dir, TICKERS + watchlist_symbols(10))
+    market_data.reload()
+
+async def create_user(symbols):
+    """
+    Create a user tracking `symbols`.
+
+    Returns:
+        Tuple of (email, auth cookie value)
+    """
+    from fastapi_users.db import SQLAlchemyUserDatabase
+    from main import UserCreate
+    from app.auth import UserManager, get_jwt_strategy
+    from app.db import AsyncSessionLocal, User, Stock
+
+    email = f"test-{uuid.uuid4().hex[:8]}@example.com"
+    async with AsyncSessionLocal() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        user = await manager.create(UserCreate(email=email, password=TEST_PASSWORD, is_active=True))
+        session.add_all(Stock(user_id=user.id, symbol=symbol) for symbol in symbols)
+        await session.commit()
+        token = await get_jwt_strategy().write_token(user)
+    return email, token
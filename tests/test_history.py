@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+from app.db import AsyncSessionLocal
+from app.history import get_price_history, _get_coverage
+from app.providers import market_data
+
+async def view(symbol, period):
+    async with AsyncSessionLocal() as session:
+        hist = await get_price_history(session, symbol, period)
+        coverage = await _get_coverage(session, symbol)
+        return hist, coverage
+
+def provider_bars(symbol, period):
+    return market_data.get_history(symbol, period=period)
+
+def test_short_view_does_not_mark_history_complete(run):
+    hist, coverage = run(view, "W0001", "5d")
+    assert len(hist) == 5
+    assert not coverage.is_complete
+
+    hist, coverage = run(view, "W0001", "1y")
+    # The whole year is there, not just the bars the 5d view stored
+    assert hist.index[0].date() <= date.today() - timedelta(days=360)
+    assert not coverage.is_complete
+
+def test_longer_period_widens_coverage(run):
+    _, coverage = run(view, "W0002", "1mo")
+    first_month = coverage.first_date
+
+    hist, coverage = run(view, "W0002", "2y")
+    assert coverage.first_date < first_month
+    assert hist.index.is_unique
+    assert hist.index.is_monotonic_increasing
+
+    # Shorter periods are now served from the stored bars
+    hist, _ = run(view, "W0002", "6mo")
+    assert hist.index[0].date() > coverage.first_date
+
+def test_max_view_marks_history_complete(run):
+    hist, coverage = run(view, "W0003", "max")
+    assert coverage.is_complete
+    assert len(hist) == len(provider_bars("W0003", "max"))
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+import pytest
+from starlette.requests import Request
+from app.http_cache import http_date, is_not_modified
+
+ETAG = 'W/"abc"'
+LAST_MODIFIED = datetime(1994, 11, 6, 8, 49, 37, tzinfo=timezone.utc)
+
+def request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    })
+
+# The three HTTP-date forms of RFC 9110, plus the "-0000" offset some clients send
+@pytest.mark.parametrize("value", [
+    "Sun, 06 Nov 1994 08:49:37 GMT",
+    "Sunday, 06-Nov-94 08:49:37 GMT",
+    "Sun Nov  6 08:49:37 1994",
+    "Sun, 06 Nov 1994 08:49:37 -0000"
+])
+def test_if_modified_since_date_forms(value):
+    assert is_not_modified(request(if_modified_since=value), ETAG, LAST_MODIFIED)
+
+def test_if_modified_since_before_last_modified():
+    assert not is_not_modified(request(if_modified_since="Sat, 05 Nov 1994 08:49:37 GMT"), ETAG, LAST_MODIFIED)
+
+@pytest.mark.parametrize("value", ["", "yesterday", "Sun, 06 Nov", "Sun, 99 Nov 1994 08:49:37 GMT"])
+def test_malformed_if_modified_since_is_ignored(value):
+    assert not is_not_modified(request(if_modified_since=value), ETAG, LAST_MODIFIED)
+
+def test_if_none_match_takes_precedence():
+    headers = {"if_modified_since": http_date(LAST_MODIFIED)}
+    assert is_not_modified(request(if_none_match='"abc"', **headers), ETAG, LAST_MODIFIED)
+    assert not is_not_modified(request(if_none_match='W/"other"', **headers), ETAG, LAST_MODIFIED)
@@ -0,0 +1,68 @@
+from sqlalchemy import select
+from app.db import AsyncSessionLocal, User
+from app.quotes import _publish, store_quotes
+from main import TICKERS, stream_quote_updates
+from .fixtures import create_user
+
+class ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+async def next_update(user_email, symbols, changes):
+    """Open the quote stream as a user (or anonymously), publish `changes` and return the event it sends."""
+    async with AsyncSessionLocal() as session:
+        user = None
+        if user_email:
+            user = (await session.execute(select(User).where(User.email == user_email))).scalars().one()
+        response = await stream_quote_updates(ConnectedRequest(), symbols, user=user, session=session)
+        events = response.body_iterator
+        try:
+            assert await anext(events) == "retry: 5000\n\n"
+            _publish(changes)
+            # Skip heartbeats and updates from the background refresher
+            while True:
+                event = await anext(events)
+                if '{"price":1.0}' in event:
+                    return event
+        finally:
+            await events.aclose()
+
+CHANGES = {TICKERS[0]: {"price": 1.0}, "W0005": {"price": 2.0}, "OTHER": {"price": 3.0}}
+
+def test_stream_hides_other_watchlists_from_anonymous_callers(run):
+    event = run(next_update, None, None, CHANGES)
+    assert TICKERS[0] in event
+    assert "W0005" not in event and "OTHER" not in event
+
+    # Asking for a symbol explicitly does not reveal it either
+    event = run(next_update, None, f"{TICKERS[0]},OTHER", CHANGES)
+    assert TICKERS[0] in event and "OTHER" not in event
+
+def test_stream_includes_callers_own_symbols(run):
+    email, _ = run(create_user, ["W0005"])
+    event = run(next_update, email, None, CHANGES)
+    assert TICKERS[0] in event and "W0005" in event
+    assert "OTHER" not in event
+
+async def store_outliers():
+    """Cache a huge gainer and loser that only one user's watchlist tracks."""
+    from app.providers import market_data
+    quotes, _ = market_data.get_quotes(["W0007", "W0008"])
+    quotes["W0007"]["percent_change"] = 500.0
+    quotes["W0008"]["percent_change"] = -90.0
+    store_quotes(quotes)
+
+def movers(client, headers=None):
+    body = client.get("/api/movers?k=3", headers=headers).json()
+    return [quote["symbol"] for quote in body["gainers"]], [quote["symbol"] for quote in body["losers"]]
+
+def test_movers_only_rank_public_tickers_for_anonymous_callers(client, run):
+    run(store_outliers)
+    gainers, losers = movers(client)
+    assert set(gainers + losers) <= set(TICKERS)
+
+def test_movers_rank_callers_own_symbols(client, run, user_cookie):
+    run(store_outliers)
+    gainers, losers = movers(client, user_cookie)
+    assert gainers[0] == "W0007"
+    assert losers[0] == "W0008"
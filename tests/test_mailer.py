@@ -0,0 +1,102 @@
+import asyncio, smtplib, time
+import pytest
+import app.mailer
+from app.mailer import MailQueue
+
+class SmtpSink:
+    """In-process SMTP server that records each message body, optionally answering DATA slowly."""
+
+    def __init__(self):
+        self.messages = []
+        self.delay = 0.0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+
+    async def handle(self, reader, writer):
+        writer.write(b"220 sink\r\n")
+        data = None
+        while line := await reader.readline():
+            if data is not None:
+                if line.rstrip(b"\r\n") == b".":
+                    await asyncio.sleep(self.delay)
+                    self.messages.append(b"".join(data))
+                    data = None
+                    writer.write(b"250 OK\r\n")
+                else:
+                    data.append(line)
+                continue
+            command = line[:4].upper()
+            if command == b"DATA":
+                data = []
+                writer.write(b"354 go ahead\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 bye\r\n")
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+class SinkMailQueue(MailQueue):
+    def __init__(self, port: int):
+        super().__init__(backend="smtp")
+        self.port = port
+
+    def _connect(self):
+        # Socket timeout well above the batch timeouts used here, so batches time out first
+        smtp = smtplib.SMTP("127.0.0.1", self.port, local_hostname="localhost", timeout=5)
+        self._stats["connections"] += 1
+        return smtp
+
+async def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the mail queue"
+        await asyncio.sleep(0.02)
+
+async def send_over_sink(count: int, slow_first_batch: bool = False):
+    sink = SmtpSink()
+    queue = SinkMailQueue(await sink.start())
+    queue.start()
+    try:
+        if slow_first_batch:
+            sink.delay = 0.5
+        for i in range(count):
+            queue.enqueue(f"user{i}@example.com", f"Subject: {i}\n\nmessage {i}")
+        if slow_first_batch:
+            await wait_for(lambda: queue.stats()["timeouts"])
+            sink.delay = 0.0
+        await wait_for(lambda: queue.stats()["sent"] + queue.stats()["failed"] == count)
+        await queue.stop(timeout=1)
+        return sink.messages, queue.stats()
+    finally:
+        await sink.stop()
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(app.mailer, "EMAIL_BATCH_SIZE", 5)
+    monkeypatch.setattr(app.mailer, "EMAIL_RETRY_BACKOFF", 0.05)
+
+def test_batches_share_one_connection(run, small_batches):
+    messages, stats = run(send_over_sink, 12)
+    assert len(messages) == 12 and len(set(messages)) == 12
+    assert stats["sent"] == 12
+    assert stats["connections"] == 1
+    assert stats["batches"] >= 3
+
+def test_abandoned_batch_sends_nothing_twice(run, small_batches, monkeypatch):
+    # Five 0.5s sends against a (5 + 1) * 0.2s batch timeout: the batch is abandoned
+    # during its third message, and the last two are retried on a new connection
+    monkeypatch.setattr(app.mailer, "EMAIL_SMTP_TIMEOUT", 0.2)
+    messages, stats = run(send_over_sink, 5, True)
+    assert len(messages) == 5 and len(set(messages)) == 5
+    assert stats["sent"] == 5 and stats["failed"] == 0
+    assert stats["timeouts"] == 1
+    assert stats["retried"] == 2
+    assert stats["connections"] == 2
@@ -0,0 +1,82 @@
+import time
+import pytest
+from app.providers import market_data
+from app.quotes import quote_cache, store_quotes
+from app.shared_quotes import SEQUENCE, SEQUENCE_OFFSET, SharedQuoteSnapshot
+
+SYMBOLS = ["W0001", "W0002", "W0003"]
+
+@pytest.fixture
+def cached_quotes(run):
+    async def store():
+        quotes, _ = market_data.get_quotes(SYMBOLS)
+        store_quotes(quotes)
+    run(store)
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "quotes.snapshot")
+
+def test_reader_sees_each_published_snapshot_once(path, cached_quotes):
+    writer, reader = SharedQuoteSnapshot(path, capacity=8), SharedQuoteSnapshot(path, capacity=8)
+    assert writer.try_become_writer()
+    assert not reader.try_become_writer()
+
+    writer.publish(SYMBOLS)
+    quotes, fetched_at = reader.read()
+    assert list(quotes) == SYMBOLS
+    for symbol in SYMBOLS:
+        view, cached_at = quote_cache.entry(symbol)
+        assert quotes[symbol]["price"] == view.price
+        assert quotes[symbol]["name"] == view.name
+        # Fetch times travel as epoch seconds
+        assert fetched_at[symbol] == pytest.approx(cached_at + time.time() - time.monotonic(), abs=0.01)
+    assert reader.read() is None
+
+    writer.publish(SYMBOLS[:1])
+    quotes, _ = reader.read()
+    assert list(quotes) == SYMBOLS[:1]
+
+def test_read_during_a_write_is_retried(path, cached_quotes):
+    writer, reader = SharedQuoteSnapshot(path), SharedQuoteSnapshot(path)
+    writer.try_become_writer()
+    writer.publish(SYMBOLS)
+
+    sequence = SEQUENCE.unpack_from(writer._map, SEQUENCE_OFFSET)[0]
+    SEQUENCE.pack_into(writer._map, SEQUENCE_OFFSET, sequence + 1)  # writer mid-update
+    assert reader.read(retries=3) is None
+    assert reader.stats()["read_retries"] == 3
+
+    SEQUENCE.pack_into(writer._map, SEQUENCE_OFFSET, sequence)
+    assert reader.read() is not None
+
+def test_reader_takes_over_when_the_writer_exits(path, cached_quotes):
+    writer, reader = SharedQuoteSnapshot(path), SharedQuoteSnapshot(path)
+    writer.try_become_writer()
+    writer.publish(SYMBOLS)
+    reader.read()
+    # The writer dies halfway through its next update
+    SEQUENCE.pack_into(writer._map, SEQUENCE_OFFSET, reader.stats()["sequence"] + 1)
+    writer.close_map()
+    writer._lock_file.close()
+
+    assert reader.try_become_writer()
+    assert reader.is_writer
+    sequence = SEQUENCE.unpack_from(reader._map, SEQUENCE_OFFSET)[0]
+    assert sequence % 2 == 0 and sequence > reader.stats()["sequence"]
+
+    follower = SharedQuoteSnapshot(path)
+    assert not follower.try_become_writer()
+    reader.publish(SYMBOLS)
+    quotes, _ = follower.read()
+    assert list(quotes) == SYMBOLS
+
+def test_stale_snapshot_quotes_are_left_to_the_reader(path, cached_quotes):
+    writer, reader = SharedQuoteSnapshot(path), SharedQuoteSnapshot(path)
+    writer.try_become_writer()
+    view, _ = quote_cache.entry("W0003")
+    quote_cache.set("W0003", view, fetched_at=time.monotonic() - quote_cache.ttl - 1)
+    writer.publish(SYMBOLS)
+    reader.read()
+
+    assert reader.symbols() == {"W0001", "W0002"}
@@ -0,0 +1,72 @@
+import asyncio, gc, time
+import pytest
+from app.singleflight import SingleFlight, run_upstream
+
+async def join_two_callers():
+    flight, calls = SingleFlight(), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "quote"
+
+    results = await asyncio.gather(flight.do("AAPL", fetch), flight.do("AAPL", fetch))
+    return results, len(calls), flight.stats()
+
+def test_concurrent_callers_share_one_call(run):
+    results, calls, stats = run(join_two_callers)
+    assert results == ["quote", "quote"]
+    assert calls == 1
+    assert stats == {"calls": 1, "coalesced": 1, "in_flight": 0}
+
+async def impatient_and_patient_callers():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.1)
+        return "quote"
+
+    impatient = asyncio.ensure_future(flight.do("AAPL", fetch, timeout=0.01))
+    patient = asyncio.ensure_future(flight.do("AAPL", fetch))
+    return await asyncio.gather(impatient, patient, return_exceptions=True)
+
+def test_caller_timeout_does_not_cancel_shared_call(run):
+    impatient, patient = run(impatient_and_patient_callers)
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == "quote"
+
+async def abandoned_failure():
+    loop = asyncio.get_running_loop()
+    unhandled = []
+    previous = loop.get_exception_handler()
+    loop.set_exception_handler(lambda _, context: unhandled.append(context))
+    try:
+        async def fetch():
+            await asyncio.sleep(0.02)
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await SingleFlight().do("AAPL", fetch, timeout=0.01)
+        await asyncio.sleep(0.05)
+        gc.collect()
+    finally:
+        loop.set_exception_handler(previous)
+    return unhandled
+
+def test_failure_after_every_caller_gave_up_is_not_logged_as_unretrieved(run):
+    assert run(abandoned_failure) == []
+
+def slow_upstream_call():
+    time.sleep(0.1)
+    return "history"
+
+async def short_timeout_starts_upstream_call():
+    first = asyncio.ensure_future(run_upstream(("test", "AAPL"), slow_upstream_call, timeout=0.02))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(run_upstream(("test", "AAPL"), slow_upstream_call, timeout=1))
+    return await asyncio.gather(first, second, return_exceptions=True)
+
+def test_upstream_call_outlives_the_caller_that_started_it(run):
+    first, second = run(short_timeout_starts_upstream_call)
+    assert isinstance(first, asyncio.TimeoutError)
+    assert second == "history"
@@ -0,0 +1,39 @@
+from .fixtures import watchlist_symbols
+
+def exported_symbols(client, cookie):
+    return client.get("/export-stocks?format=json", headers=cookie).json()["symbols"]
+
+def test_replace_import_with_only_invalid_symbols_keeps_watchlist(client, user_cookie):
+    response = client.post(
+        "/import-stocks", data={"symbols": "$$$, !!!", "replace": "true"},
+        headers=user_cookie, follow_redirects=False
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["invalid"] == ["$$$", "!!!"]
+    assert exported_symbols(client, user_cookie) == watchlist_symbols(10)
+
+def test_replace_import_with_rejected_entries_changes_nothing(client, user_cookie):
+    response = client.post(
+        "/import-stocks", data={"symbols": "AAPL, $$$", "replace": "true"},
+        headers=user_cookie, follow_redirects=False
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["invalid"] == ["$$$"]
+    assert exported_symbols(client, user_cookie) == watchlist_symbols(10)
+
+def test_replace_import_with_valid_symbols_replaces_watchlist(client, user_cookie):
+    response = client.post(
+        "/import-stocks", data={"symbols": "msft aapl", "replace": "true"},
+        headers=user_cookie, follow_redirects=False
+    )
+
+    assert response.status_code == 303
+    assert exported_symbols(client, user_cookie) == ["AAPL", "MSFT"]
+
+def test_api_replace_with_no_symbols_is_refused(client, user_cookie):
+    response = client.post("/api/watchlist", json={"add": [], "replace": True}, headers=user_cookie)
+
+    assert response.status_code == 400
+    assert exported_symbols(client, user_cookie) == watchlist_symbols(10)